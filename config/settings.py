@@ -57,6 +57,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'expenses.middleware.RequestTimingMiddleware',
+    'expenses.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -67,6 +69,15 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Opt-in request instrumentation (see expenses/middleware.py): adds a
+# Server-Timing header and logs requests slower than SLOW_MS with their
+# slowest and most repeated SQL.
+REQUEST_TIMING = {
+    'ENABLED': os.environ.get('REQUEST_TIMING', 'False') == 'True',
+    'SLOW_MS': float(os.environ.get('REQUEST_TIMING_SLOW_MS', 500)),
+    'TOP_SQL': int(os.environ.get('REQUEST_TIMING_TOP_SQL', 5)),
+}
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -106,6 +117,54 @@ else:
         }
     }
 
+# Optional read replicas: DATABASE_REPLICA_URLS=url1,url2,...
+# Views marked @replica_reads (group page, CSV exports, JSON API) read from a
+# replica; writes, and every request from a user within
+# REPLICA_STICKY_SECONDS of their last POST, stay on the primary
+# (see expenses/routers.py). Locally, two SQLite files work:
+#   DATABASE_URL=sqlite:///primary.sqlite3 DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3
+DATABASE_REPLICAS = []
+for index, url in enumerate(u for u in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if u.strip()):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=600)
+    # tests run against the primary only
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['expenses.routers.ReplicaRouter'] if DATABASE_REPLICAS else []
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Group balances and settlement plans are cached per data version (see
+# expenses/cache.py). With more than one worker process (WEB_CONCURRENCY,
+# which gunicorn also reads) this must be a shared backend, e.g.
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache and
+# CACHE_LOCATION=/var/tmp/splitwise_cache; the expenses.E001 check fails
+# otherwise.
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'splitwise'),
+    }
+}
+
+EXPENSES_CACHE_TIMEOUT = int(os.environ.get('EXPENSES_CACHE_TIMEOUT', 60 * 60))
+
+
+# PDF reports are rendered by a background thread pool and kept on disk,
+# one file per group data version (see expenses/reports.py).
+# REPORT_WORKERS = 0 renders inline instead.
+REPORTS_ROOT = Path(os.environ.get('REPORTS_ROOT', BASE_DIR / 'reports'))
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+
+# Settled history moved out of the live tables (see expenses/archive.py)
+# is written here as one compressed JSON-lines file per archived period.
+ARCHIVE_ROOT = Path(os.environ.get('ARCHIVE_ROOT', BASE_DIR / 'archive'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -151,4 +210,14 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # Authentication settings
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'
-LOGOUT_REDIRECT_URL = '/accounts/login/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/accounts/login/'
+
+
+# Settlement planner used for "Who Should Pay Whom" (see expenses/settlement.py)
+# 'greedy' is O(n log n); 'exact' finds the minimum number of transfers
+# within the member/time budget and falls back to greedy beyond it.
+SETTLEMENT_PLANNER = {
+    'STRATEGY': os.environ.get('SETTLEMENT_STRATEGY', 'greedy'),
+    'EXACT_MAX_MEMBERS': int(os.environ.get('SETTLEMENT_EXACT_MAX_MEMBERS', 14)),
+    'EXACT_TIME_BUDGET': float(os.environ.get('SETTLEMENT_EXACT_TIME_BUDGET', 0.05)),
+}
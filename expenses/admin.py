@@ -1,7 +1,36 @@
 from django.contrib import admin
 from .models import Group, Expense, Split, Settlement 
+from .cache import invalidate_group
+from .checkpoints import invalidate_checkpoints
+from .utils import apply_balance_deltas, reserve_seqs, row_deltas
+
+
+class LedgerRowAdmin(admin.ModelAdmin):
+    """
+    Rows added here bypass the record_* helpers, so their seq and ledger
+    deltas are applied here; edits and deletes are handled in
+    expenses.signals.
+    """
+
+    # handed out on save, see below and expenses.signals
+    readonly_fields = ('seq',)
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            return super().save_model(request, obj, form, change)
+
+        if isinstance(obj, Split):
+            obj.group_id = obj.expense.group_id
+        group_id, deltas = row_deltas(obj)
+        # the admin view runs in a transaction, which reserve_seqs needs
+        obj.seq = next(reserve_seqs(Group(pk=group_id), 1))
+        super().save_model(request, obj, form, change)
+        apply_balance_deltas(Group(pk=group_id), deltas)
+        invalidate_checkpoints(group_id, obj.created_at)
+        invalidate_group(group_id)
+
 
 admin.site.register(Group)
-admin.site.register(Expense)
-admin.site.register(Split)
-admin.site.register(Settlement)
+admin.site.register(Expense, LedgerRowAdmin)
+admin.site.register(Split, LedgerRowAdmin)
+admin.site.register(Settlement, LedgerRowAdmin)
@@ -0,0 +1,181 @@
+"""
+Read-only JSON API for groups.
+
+Every response carries an ETag built from the group's data version (see
+expenses.cache), so a client polling an unchanged group gets a 304 after
+one cheap lookup, without any balance computation. There is no
+Last-Modified: admin edits and ledger rebuilds change the data without
+leaving a timestamp, and the version is what every write moves.
+"""
+import hashlib
+from functools import wraps
+
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from django.utils.cache import get_conditional_response
+
+from .cache import data_version, get_group_summary
+from .checkpoints import ArchivedAsOf, parse_as_of
+from .models import Group
+from .pagination import keyset_page
+from .routers import replica_reads
+from .sync import changes_since
+
+API_PAGE_SIZE = 50
+
+
+def group_api(view):
+    """
+    Authenticates, loads the group (members only) and answers conditional
+    GETs before the view runs. The view gets (request, group) and returns
+    a dict to serialise.
+    """
+
+    @wraps(view)
+    def wrapper(request, group_id):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        if not request.user.is_authenticated:
+            return JsonResponse({'detail': 'Authentication required.'}, status=401)
+        group = Group.objects.filter(id=group_id, members=request.user).first()
+        if group is None:
+            raise Http404("No such group.")
+
+        # the representation depends on the version, the query string and,
+        # for per-user fields, on who is asking
+        fingerprint = f"{data_version(group)}:{request.user.id}:{request.get_full_path()}"
+        etag = '"%s"' % hashlib.sha1(fingerprint.encode()).hexdigest()
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                response = JsonResponse(view(request, group))
+            except ArchivedAsOf as archived:
+                # the rows behind that date now live in an archive file
+                return JsonResponse(
+                    {'detail': str(archived), 'archived_period': archived.period.id},
+                    status=410,
+                )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    return wrapper
+
+
+def _user(user):
+    return {'id': user.id, 'username': user.username}
+
+
+@replica_reads
+@group_api
+def group_summary(request, group):
+    summary = get_group_summary(group)
+    members = group.members.order_by('username')
+    my_balance = next(
+        (amount for user, amount in summary['balances'].items() if user.id == request.user.id),
+        0,
+    )
+    return {
+        'id': group.id,
+        'name': group.name,
+        'created_at': group.created_at.isoformat(),
+        'members': [_user(m) for m in members],
+        'my_balance': str(my_balance),
+        'pending_transfers': len(summary['transactions']),
+    }
+
+
+@replica_reads
+@group_api
+def group_balances(request, group):
+    as_of = parse_as_of(request.GET.get('as_of'))
+    balances = get_group_summary(group, as_of=as_of)['balances']
+    return {
+        'as_of': as_of.isoformat() if as_of else None,
+        'balances': [
+            {'user': _user(user), 'amount': str(amount)}
+            for user, amount in sorted(balances.items(), key=lambda b: b[0].username)
+        ],
+    }
+
+
+@replica_reads
+@group_api
+def group_settlement_plan(request, group):
+    as_of = parse_as_of(request.GET.get('as_of'))
+    summary = get_group_summary(group, as_of=as_of)
+    return {
+        'version': summary['version'],
+        'as_of': as_of.isoformat() if as_of else None,
+        'transactions': [
+            {'from': _user(debtor), 'to': _user(creditor), 'amount': str(amount)}
+            for debtor, creditor, amount in summary['transactions']
+        ],
+    }
+
+
+@replica_reads
+@group_api
+def group_expenses(request, group):
+    page = keyset_page(
+        group.expenses.select_related('paid_by').prefetch_related('splits__user'),
+        cursor=request.GET.get('cursor'),
+        page_size=API_PAGE_SIZE,
+    )
+    return {
+        'results': [
+            {
+                'id': e.id,
+                'description': e.description,
+                'amount': str(e.amount),
+                'paid_by': _user(e.paid_by),
+                'created_at': e.created_at.isoformat(),
+                'splits': [
+                    {'user': _user(s.user), 'amount': str(s.amount)}
+                    for s in e.splits.all()
+                ],
+            }
+            for e in page.items
+        ],
+        'next_cursor': page.next_cursor,
+    }
+
+
+@replica_reads
+@group_api
+def group_activities(request, group):
+    page = keyset_page(
+        group.activities.select_related('user'),
+        cursor=request.GET.get('cursor'),
+        page_size=API_PAGE_SIZE,
+    )
+    return {
+        'results': [
+            {
+                'id': a.id,
+                'user': _user(a.user),
+                'message': a.message,
+                'created_at': a.created_at.isoformat(),
+            }
+            for a in page.items
+        ],
+        'next_cursor': page.next_cursor,
+    }
+
+
+@group_api
+def group_changes(request, group):
+    # change_seq as committed now; the fetched group row may be older
+    groups = Group.objects.filter(id=group.id).values_list('id', 'change_seq')
+    return changes_since(groups, request.GET.get('cursor'))
+
+
+def user_changes(request):
+    """Change feed across every group the user belongs to."""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication required.'}, status=401)
+
+    groups = request.user.split_groups.values_list('id', 'change_seq')
+    return JsonResponse(changes_since(groups, request.GET.get('cursor')))
@@ -0,0 +1,150 @@
+"""
+Archival of fully settled history.
+
+When every member of a group was square at some checkpoint, nothing
+before it can affect a balance again. archive_period() moves the
+Expense, Split, Settlement and Activity rows created before that point
+into a gzipped JSON-lines file under settings.ARCHIVE_ROOT and leaves
+one ArchivedPeriod summary row behind, so the live tables (and every
+scan over them) only hold history since the last settled point.
+
+The file starts with a header line, followed by one line per row:
+{"type": "expense" | "split" | "settlement" | "activity", ...}.
+"""
+import gzip
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Sum
+
+from .cache import invalidate_group
+from .checkpoints import balances_as_of
+from .models import Activity, ArchivedPeriod, Expense, Group, Settlement, Split
+from .utils import reserve_seqs
+
+CHUNK_SIZE = 2000
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def archive_root():
+    return Path(settings.ARCHIVE_ROOT)
+
+
+def settled_cutoff(group: Group, before):
+    """
+    The latest checkpoint instant before `before`, and after anything
+    already archived, at which every balance in the group was zero.
+    """
+
+    checkpoints = group.checkpoints.filter(as_of__lte=before).order_by('-as_of')
+    archived = group.archived_periods.order_by('-end').values_list('end', flat=True).first()
+    if archived is not None:
+        checkpoints = checkpoints.filter(as_of__gt=archived)
+    for checkpoint in checkpoints.iterator():
+        if not any(checkpoint.balances.values()):
+            return checkpoint.as_of
+    return None
+
+
+def _rows(group, end):
+    return {
+        'expense': Expense.objects.filter(group=group, created_at__lt=end),
+        'split': Split.objects.filter(expense__group=group, expense__created_at__lt=end),
+        'settlement': Settlement.objects.filter(group=group, created_at__lt=end),
+        'activity': Activity.objects.filter(group=group, created_at__lt=end),
+    }
+
+
+FIELDS = {
+    'expense': ('id', 'created_at', 'description', 'amount', 'paid_by_id', 'paid_by__username', 'seq'),
+    'split': ('id', 'expense_id', 'user_id', 'user__username', 'amount', 'seq'),
+    'settlement': ('id', 'created_at', 'paid_by_id', 'paid_by__username',
+                   'paid_to_id', 'paid_to__username', 'amount', 'seq'),
+    'activity': ('id', 'created_at', 'user_id', 'message', 'seq'),
+}
+
+
+def _write(path, header, querysets):
+    """Streams the rows to a temp file and moves it into place."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    counts = dict.fromkeys(querysets, 0)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as out:
+            out.write(json.dumps(header, cls=DjangoJSONEncoder) + '\n')
+            for kind, qs in querysets.items():
+                for row in qs.order_by('id').values(*FIELDS[kind]).iterator(CHUNK_SIZE):
+                    out.write(json.dumps({'type': kind, **row}, cls=DjangoJSONEncoder) + '\n')
+                    counts[kind] += 1
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return counts
+
+
+def archive_period(group: Group, end):
+    """
+    Archives everything in the group created before `end`, which must be
+    a point where all balances were zero. Returns the ArchivedPeriod, or
+    None when there was nothing left to archive.
+    """
+
+    with transaction.atomic():
+        # takes the same row lock as every writer, so nothing can be added
+        # before `end` while the rows are moved; the new seq also changes
+        # the group's data_version
+        reserve_seqs(group, 1)
+        group = Group.objects.get(pk=group.pk)
+
+        if any(balances_as_of(group, end).values()):
+            raise ArchiveError(f"{group.name} was not fully settled on {end:%Y-%m-%d}.")
+
+        rows = _rows(group, end)
+        if not any(qs.exists() for kind, qs in rows.items() if kind != 'activity'):
+            return None
+
+        previous = group.archived_periods.order_by('-end').values_list('end', flat=True).first()
+        relative = Path(f"group-{group.id}") / f"{end:%Y%m%d%H%M%S}.jsonl.gz"
+        header = {'type': 'header', 'group': group.id, 'name': group.name, 'start': previous, 'end': end}
+        counts = _write(archive_root() / relative, header, rows)
+
+        period = ArchivedPeriod.objects.create(
+            group=group,
+            start=previous,
+            end=end,
+            path=str(relative),
+            expense_count=counts['expense'],
+            split_count=counts['split'],
+            settlement_count=counts['settlement'],
+            activity_count=counts['activity'],
+            total_spent=rows['expense'].aggregate(total=Sum('amount'))['total'] or 0,
+        )
+
+        # _raw_delete skips the per-row delete signals (cache and checkpoint
+        # invalidation), which would otherwise load every row; both are
+        # handled once below. Splits go first for the FK to Expense.
+        for kind in ('split', 'expense', 'settlement', 'activity'):
+            rows[kind]._raw_delete(rows[kind].db)
+
+        # checkpoints inside the archived stretch summarise rows that are gone
+        group.checkpoints.filter(as_of__lt=end).delete()
+        invalidate_group(group.id)
+    return period
+
+
+def read_archive(period: ArchivedPeriod):
+    """Yields the archived rows (dicts with a 'type' key), header first."""
+
+    with gzip.open(archive_root() / period.path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
@@ -0,0 +1,109 @@
+"""
+Versioned cache for per-group balances and settlement plans.
+
+Each group has a version number stored in Django's cache. Cached data is
+keyed by that version, so bumping it (on any Expense, Split or Settlement
+write, see expenses.signals) makes every older entry unreachable. Old
+entries are never read again and simply expire.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .checkpoints import balances_as_of, end_of_day
+from .utils import calculate_balances, hydrate_balances, simplify_debts
+
+VERSION_KEY = 'expenses:group:{}:version'
+SUMMARY_KEY = 'expenses:group:{}:v{}:summary'
+STATS_KEY = 'expenses:cache:{}'
+
+
+def group_version(group_id):
+    """Current data version of a group (created on first use)."""
+
+    key = VERSION_KEY.format(group_id)
+    version = cache.get(key)
+    if version is None:
+        # start from the clock so a version lost to eviction can't be
+        # reused with data that was cached under it before
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def data_version(group):
+    """
+    Key for anything cached from the group's data: the cache version plus
+    the change_seq of the `group` row it was read with. A lagging read
+    replica returns an older change_seq, so what it computes can't be
+    cached under the key that fresh data is looked up with.
+    """
+
+    return f"{group_version(group.id)}.{group.change_seq}"
+
+
+def bump_group_version(group_id):
+    key = VERSION_KEY.format(group_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate_group(group_id):
+    """
+    Bump now so this request sees its own write, and again on commit so a
+    reader that raced the transaction can't pin stale data to the new version.
+    """
+
+    bump_group_version(group_id)
+    transaction.on_commit(lambda: bump_group_version(group_id))
+
+
+def _count(name):
+    key = STATS_KEY.format(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def cache_stats():
+    return {
+        name: cache.get(STATS_KEY.format(name), 0)
+        for name in ('hits', 'misses')
+    }
+
+
+def get_group_summary(group, as_of=None):
+    """
+    Returns {'version', 'balances', 'transactions'} for a group, from the
+    cache when the group hasn't changed since it was last computed.
+    With `as_of` (a date) the balances are those at the end of that day,
+    from the nearest checkpoint (see expenses.checkpoints).
+    """
+
+    version = data_version(group)
+    key = SUMMARY_KEY.format(group.id, version)
+    if as_of is not None:
+        key += f':{as_of.isoformat()}'
+
+    summary = cache.get(key)
+    if summary is not None:
+        _count('hits')
+        return summary
+
+    _count('misses')
+    if as_of is None:
+        balances = calculate_balances(group)
+    else:
+        balances = hydrate_balances(balances_as_of(group, end_of_day(as_of)))
+    summary = {
+        'version': version,
+        'balances': balances,
+        'transactions': simplify_debts(balances),
+    }
+    cache.set(key, summary, settings.EXPENSES_CACHE_TIMEOUT)
+    return summary
@@ -0,0 +1,131 @@
+"""
+Balance checkpoints: point-in-time balances without replaying history.
+
+A BalanceCheckpoint stores every member's net balance over the rows
+created before its `as_of` watermark. The balances at any instant are
+the nearest earlier checkpoint plus grouped sums over the rows created
+between the two, so the work is bounded by one period of activity.
+
+Checkpoints are built for past period boundaries (build_checkpoints
+command). A write dated before a checkpoint (a backdated import, an
+admin edit or delete) drops the checkpoints it affects.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import BalanceCheckpoint, Expense, Group, Settlement
+from .utils import aggregate_totals
+
+PERIODS = ('day', 'week', 'month')
+
+
+def parse_as_of(value):
+    """The date in an ?as_of=YYYY-MM-DD parameter, or None."""
+
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def end_of_day(day):
+    """Balances 'as of' a date include that whole day (local time)."""
+
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+class ArchivedAsOf(Exception):
+    """The requested instant is inside archived history, whose rows are no
+    longer live; balances computed from them would all read zero."""
+
+    def __init__(self, period):
+        super().__init__(f"History up to {period.end:%Y-%m-%d} is archived.")
+        self.period = period
+
+
+def archived_period_at(group: Group, as_of):
+    """The ArchivedPeriod holding the history up to `as_of`, or None."""
+
+    return group.archived_periods.filter(end__gte=as_of).order_by('end').first()
+
+
+def balances_as_of(group: Group, as_of):
+    """{user_id: net_paise} over the rows created before `as_of`."""
+
+    checkpoint = (
+        group.checkpoints.filter(as_of__lte=as_of)
+        .order_by('-as_of').first()
+    )
+    # archiving drops the checkpoints before its end, so only a miss can
+    # land inside an archived period
+    if checkpoint is None:
+        period = archived_period_at(group, as_of)
+        if period is not None:
+            raise ArchivedAsOf(period)
+    totals = defaultdict(int, checkpoint.totals() if checkpoint else {})
+    after = checkpoint.as_of if checkpoint else None
+    for user_id, amount in aggregate_totals(group, after=after, before=as_of).items():
+        totals[user_id] += amount
+    return dict(totals)
+
+
+def build_checkpoint(group: Group, as_of):
+    checkpoint, _ = BalanceCheckpoint.objects.update_or_create(
+        group=group, as_of=as_of,
+        defaults={'balances': balances_as_of(group, as_of)},
+    )
+    return checkpoint
+
+
+def period_starts(start, end, period):
+    """Local period boundaries in (start, end]."""
+
+    local = timezone.localtime(start).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'week':
+        local -= timedelta(days=local.weekday())
+    elif period == 'month':
+        local = local.replace(day=1)
+
+    while True:
+        if period == 'day':
+            local += timedelta(days=1)
+        elif period == 'week':
+            local += timedelta(weeks=1)
+        else:
+            local = (local + timedelta(days=32)).replace(day=1)
+        # re-localise so boundaries stay at midnight across DST changes
+        boundary = timezone.make_aware(local.replace(tzinfo=None))
+        if boundary > end:
+            return
+        yield boundary
+
+
+def build_checkpoints(group: Group, period='month', until=None):
+    """
+    Adds a checkpoint at every period boundary since the group's last
+    one (or its first row) up to `until` (default: now). Each one is
+    built from the one before, so a run only reads new rows.
+    """
+
+    until = until or timezone.now()
+    latest = group.checkpoints.order_by('-as_of').values_list('as_of', flat=True).first()
+    if latest is None:
+        firsts = [
+            qs.filter(group=group).order_by('created_at').values_list('created_at', flat=True).first()
+            for qs in (Expense.objects, Settlement.objects)
+        ]
+        firsts = [first for first in firsts if first is not None]
+        if not firsts:
+            return []
+        latest = min(firsts)
+
+    return [build_checkpoint(group, boundary) for boundary in period_starts(latest, until, period)]
+
+
+def invalidate_checkpoints(group_id, since):
+    """Drops checkpoints that include rows created at or after `since`."""
+
+    BalanceCheckpoint.objects.filter(group_id=group_id, as_of__gt=since).delete()
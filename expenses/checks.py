@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Group versions live in the cache (see expenses.cache): with several
+    worker processes and a per-process cache, a write in one worker
+    leaves the others serving stale summaries until they expire.
+    """
+
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.WEB_CONCURRENCY > 1 and backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f"WEB_CONCURRENCY is {settings.WEB_CONCURRENCY} but the default cache ({backend}) "
+            "is local to each process.",
+            hint="Set CACHE_BACKEND / CACHE_LOCATION to a shared backend (file, Redis, Memcached).",
+            id='expenses.E001',
+        )]
+    return []
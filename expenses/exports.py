@@ -0,0 +1,230 @@
+"""
+Group exports: streamed CSV (live and archived history) and the
+background-rendered PDF report.
+
+These views are routed through expenses.urls like any other, but the
+PDF renderer (expenses.pdf) and with it ReportLab are only imported when
+the first report is built, so web workers don't load them at boot.
+"""
+import csv
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+
+from .archive import read_archive
+from .cache import get_group_summary
+from .checkpoints import archived_period_at, end_of_day, parse_as_of
+from .models import ArchivedPeriod, Group, Split
+from .reports import report_path, report_status, request_report
+from .routers import replica_reads
+
+
+class Echo:
+    """File-like object whose write() hands the row back, so csv.writer
+    output can be yielded straight into a StreamingHttpResponse."""
+
+    def write(self, value):
+        return value
+
+
+CSV_CHUNK_SIZE = 2000
+
+
+def redirect_if_archived(request, group, as_of):
+    """
+    A redirect to the archived period holding `as_of`, or None. Its rows
+    are no longer live, so balances and history computed "as of" that day
+    would be empty rather than what the group owed then.
+    """
+
+    period = archived_period_at(group, end_of_day(as_of)) if as_of else None
+    if period is None:
+        return None
+    messages.info(request, f"{as_of:%Y-%m-%d} is in archived history, shown here as it was archived.")
+    return redirect('archived_period', group.id, period.id)
+
+
+def group_csv_rows(group, as_of=None):
+    """
+    Yields the CSV export row by row. Querysets are iterated as value
+    tuples in chunks, so memory stays flat however long the history is.
+    With `as_of` (a date) only rows up to the end of that day are listed.
+    """
+
+    expenses = group.expenses.all()
+    splits = Split.objects.filter(expense__group=group)
+    settlements = group.settlements.all()
+    if as_of is not None:
+        before = end_of_day(as_of)
+        expenses = expenses.filter(created_at__lt=before)
+        splits = splits.filter(expense__created_at__lt=before)
+        settlements = settlements.filter(created_at__lt=before)
+
+    # Group info
+    yield ['Group Name', group.name]
+    yield []
+
+    # Members
+    yield ['Members']
+    for (username,) in group.members.order_by('username').values_list('username').iterator(CSV_CHUNK_SIZE):
+        yield [username]
+    yield []
+
+    # Expenses
+    yield ['Expenses']
+    yield ['Description', 'Paid By', 'Amount', 'Expense ID']
+    expenses = (
+        expenses.order_by('id')
+        .values_list('description', 'paid_by__username', 'amount', 'id')
+    )
+    yield from expenses.iterator(CSV_CHUNK_SIZE)
+    yield []
+
+    # Per-member split of every expense
+    yield ['Splits']
+    yield ['Expense ID', 'User', 'Share']
+    splits = (
+        splits.order_by('expense_id', 'id')
+        .values_list('expense_id', 'user__username', 'amount')
+    )
+    yield from splits.iterator(CSV_CHUNK_SIZE)
+    yield []
+
+    # Settlements
+    yield ['Settlements']
+    yield ['Paid By', 'Paid To', 'Amount']
+    settlements = (
+        settlements.order_by('id')
+        .values_list('paid_by__username', 'paid_to__username', 'amount')
+    )
+    yield from settlements.iterator(CSV_CHUNK_SIZE)
+    yield []
+
+    # Final balances
+    balances = get_group_summary(group, as_of=as_of)['balances']
+    yield ['Final Balances' if as_of is None else f'Balances as of {as_of.isoformat()}']
+    yield ['User', 'Net Amount']
+    for user, amount in balances.items():
+        yield [user.username, amount]
+
+
+@login_required
+@replica_reads
+def export_group_csv(request, group_id):
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+    as_of = parse_as_of(request.GET.get('as_of'))
+    archived = redirect_if_archived(request, group, as_of)
+    if archived:
+        return archived
+
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in group_csv_rows(group, as_of)),
+        content_type='text/csv',
+    )
+    suffix = f"_{as_of.isoformat()}" if as_of else ''
+    response['Content-Disposition'] = f'attachment; filename="{group.name}_summary{suffix}.csv"'
+
+    return response
+
+
+@login_required
+def export_group_pdf(request, group_id):
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+    as_of = parse_as_of(request.GET.get('as_of'))
+    archived = redirect_if_archived(request, group, as_of)
+    if archived:
+        return archived
+
+    # an unchanged group's report is already on disk
+    path = request_report(group, as_of)
+    if path.exists():
+        return redirect(_with_as_of(reverse('download_group_pdf', args=[group.id]), as_of))
+
+    return render(request, 'expenses/report_status.html', {
+        'group': group,
+        'status_url': _with_as_of(reverse('group_pdf_status', args=[group.id]), as_of),
+    })
+
+
+@login_required
+def group_pdf_status(request, group_id):
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+    as_of = parse_as_of(request.GET.get('as_of'))
+    if as_of and archived_period_at(group, end_of_day(as_of)):
+        raise Http404("That date is in archived history.")
+
+    status = report_status(group, as_of)
+    if status == 'pending':
+        # the job may have been queued by another worker process
+        request_report(group, as_of)
+
+    return JsonResponse({
+        'status': status,
+        'download_url': (
+            _with_as_of(reverse('download_group_pdf', args=[group.id]), as_of)
+            if status == 'ready' else None
+        ),
+    })
+
+
+@login_required
+def download_group_pdf(request, group_id):
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+    as_of = parse_as_of(request.GET.get('as_of'))
+
+    try:
+        report = open(report_path(group.id, group.change_seq, as_of), 'rb')
+    except FileNotFoundError:
+        raise Http404("Report is not ready yet.")
+
+    suffix = f"_{as_of.isoformat()}" if as_of else ''
+    return FileResponse(
+        report,
+        as_attachment=True,
+        filename=f"{group.name}_summary{suffix}.pdf",
+        content_type='application/pdf',
+    )
+
+
+def _with_as_of(url, as_of):
+    return f"{url}?as_of={as_of.isoformat()}" if as_of else url
+
+
+def archived_csv_rows(period):
+    """The archive file as CSV, one section per row type, streamed."""
+
+    header = None
+    for row in read_archive(period):
+        kind = row.pop('type')
+        if kind == 'header':
+            yield ['Group Name', row['name']]
+            yield ['Archived Period', row['start'] or '', row['end']]
+            continue
+        if kind != header:
+            if header is not None:
+                yield []
+            header = kind
+            yield [kind.title() + 's']
+            yield list(row)
+        yield list(row.values())
+
+
+@login_required
+@replica_reads
+def export_archived_period_csv(request, group_id, period_id):
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+    period = get_object_or_404(ArchivedPeriod, id=period_id, group=group)
+
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in archived_csv_rows(period)),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{group.name}_archive_{period.end:%Y-%m-%d}.csv"'
+    )
+    return response
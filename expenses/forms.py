@@ -3,28 +3,61 @@ from django.contrib.auth.models import User
 from .models import Group, Expense
 from django.contrib.auth.forms import UserCreationForm
 
+MAX_MEMBERS_PER_FORM = 100
+
+
+class MemberChoiceField(forms.ModelMultipleChoiceField):
+    """
+    Members picked with the username autocomplete (search_users view),
+    posted as hidden user ids. Only the posted ids are looked up; the form
+    never lists every user.
+    """
+
+    widget = forms.MultipleHiddenInput
+
+    def __init__(self, queryset=None, **kwargs):
+        super().__init__(User.objects.filter(is_active=True), **kwargs)
+
+    def clean(self, value):
+        if value and len(value) > MAX_MEMBERS_PER_FORM:
+            raise forms.ValidationError(f"Add at most {MAX_MEMBERS_PER_FORM} members at a time.")
+        return super().clean(value)
+
+
+def selected_members(form):
+    """The users picked so far, to redisplay after a validation error."""
+
+    ids = [value for value in form['members'].value() or [] if str(value).isdigit()]
+    return User.objects.filter(pk__in=ids[:MAX_MEMBERS_PER_FORM]).order_by('username')
+
+
 class GroupForm(forms.ModelForm):
     class Meta:
         model = Group
         fields = ['name', 'members']
+        field_classes = {'members': MemberChoiceField}
         widgets = {
             'name': forms.TextInput(
                 attrs={'class': 'form-control'}
             ),
-            'members': forms.CheckboxSelectMultiple(),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['members'].queryset = User.objects.order_by('username')
         self.fields['name'].help_text = "Select members to add to the group (you can include yourself)."
 
 
+class AddMembersForm(forms.Form):
+    members = MemberChoiceField()
+
+
 class ExpenseForm(forms.ModelForm):
     split_type = forms.ChoiceField(
         choices=[
             ('equal', 'Split equally'),
             ('unequal', 'Unequal split'),
+            ('percentage', 'By percentage'),
+            ('shares', 'By shares'),
         ],
         widget=forms.RadioSelect(
             attrs={'class': 'form-check-input'}
@@ -49,4 +82,12 @@ class ExpenseForm(forms.ModelForm):
                 }
             ),
         }
-        
\ No newline at end of file
+
+
+class ExpenseImportForm(forms.Form):
+    file = forms.FileField(
+        help_text="CSV or NDJSON (.ndjson / .jsonl) file of expenses.",
+        widget=forms.ClearableFileInput(
+            attrs={'class': 'form-control', 'accept': '.csv,.ndjson,.jsonl,.json'}
+        ),
+    )
@@ -0,0 +1,273 @@
+"""
+Bulk expense import from CSV or NDJSON.
+
+CSV columns (header row required):
+    description, amount, paid_by, split_type, splits, date
+NDJSON: one object per line with the same keys.
+
+split_type is equal (default), unequal, percentage or shares.
+splits is who the expense is split between:
+  - equal:  usernames, e.g. "alice;bob" (blank = every member)
+  - others: username:value pairs, e.g. "alice:60;bob:40"
+    (NDJSON may use a list / an object instead)
+date is optional (ISO date or datetime) and backdates the expense.
+
+Every row is validated before anything is written; then all Expenses,
+Splits and Activity rows go in with batched bulk_create in one transaction.
+"""
+import csv
+import io
+import json
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .cache import invalidate_group
+from .checkpoints import invalidate_checkpoints
+from .models import Activity, Expense, Split
+from .money import AllocationError, split_amount, to_minor, from_minor
+from .utils import apply_balance_deltas, reserve_seqs
+
+BATCH_SIZE = 1000
+
+
+class ImportValidationError(ValueError):
+    """Raised with every row problem found; nothing has been written."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} row(s) could not be imported.")
+
+
+@dataclass
+class ImportResult:
+    rows: int
+    seconds: float
+    expense_ids: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+
+def read_rows(stream, fmt):
+    """Yields (line_number, dict) from a text stream in 'csv' or 'ndjson'."""
+
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        try:
+            for row in reader:
+                yield reader.line_num, {k.strip().lower(): (v or '').strip() for k, v in row.items() if k}
+        except csv.Error as e:
+            raise ImportValidationError([(reader.line_num, f"Malformed CSV: {e}")])
+    elif fmt == 'ndjson':
+        for line, raw in enumerate(stream, start=1):
+            if not raw.strip():
+                continue
+            try:
+                row = json.loads(raw)
+            except json.JSONDecodeError as e:
+                yield line, {'__error__': f"Invalid JSON: {e.msg}"}
+                continue
+            yield line, row if isinstance(row, dict) else {'__error__': "Expected a JSON object."}
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+
+def detect_format(filename):
+    return 'ndjson' if filename.lower().endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def _parse_splits(raw, split_type):
+    """(usernames, values) from the splits cell / value."""
+
+    if isinstance(raw, dict):
+        return list(raw), [str(v) for v in raw.values()]
+    if isinstance(raw, list):
+        return [str(u) for u in raw], ['0'] * len(raw)
+    if raw is not None and not isinstance(raw, str):
+        raise AllocationError("Splits must be text, a list or an object.")
+
+    raw = (raw or '').strip()
+    if not raw:
+        return [], []
+    usernames, values = [], []
+    for part in raw.split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        if split_type == 'equal':
+            usernames.append(part.split(':')[0].strip())
+            values.append('0')
+        else:
+            username, _, value = part.partition(':')
+            usernames.append(username.strip())
+            values.append(value.strip())
+    return usernames, values
+
+
+def _parse_date(raw):
+    if not raw:
+        return None
+    value = parse_datetime(raw)
+    if value is None:
+        day = parse_date(raw)
+        if day is None:
+            raise ValueError
+        value = datetime.combine(day, dt_time(12, 0))
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _check_field(model, name, value, label):
+    """Runs the model field's validators (max_digits etc.) on a parsed value,
+    so nothing is stored that the column can't give back."""
+
+    try:
+        model._meta.get_field(name).run_validators(value)
+    except ValidationError as e:
+        raise AllocationError(f"{label} {value}: {' '.join(e.messages)}")
+
+
+def validate_rows(group, rows):
+    """
+    Validates every row in one pass, resolving usernames against the
+    group's members, which are loaded with a single query. Returns a list
+    of plans, or raises ImportValidationError.
+    """
+
+    members = dict(group.members.values_list('username', 'id'))
+    # history up to here lives in an archive file; rows can't join it
+    archived_until = group.archived_periods.order_by('-end').values_list('end', flat=True).first()
+
+    plans, errors = [], []
+    for line, row in rows:
+        if '__error__' in row:
+            errors.append((line, row['__error__']))
+            continue
+        try:
+            description = str(row.get('description', '')).strip()
+            if not description:
+                raise AllocationError("Description is required.")
+            if len(description) > Expense._meta.get_field('description').max_length:
+                raise AllocationError("Description is too long.")
+
+            payer = str(row.get('paid_by', '')).strip()
+            if payer not in members:
+                raise AllocationError(f"Payer {payer!r} is not a member of this group.")
+
+            split_type = str(row.get('split_type') or 'equal').strip()
+            amount = from_minor(to_minor(str(row.get('amount', ''))))
+            _check_field(Expense, 'amount', amount, "Amount")
+            usernames, values = _parse_splits(row.get('splits'), split_type)
+            if not usernames:
+                if split_type != 'equal':
+                    raise AllocationError(f"Splits are required for a {split_type} split.")
+                usernames, values = list(members), ['0'] * len(members)
+            unknown = [u for u in usernames if u not in members]
+            if unknown:
+                raise AllocationError(f"Not group members: {', '.join(unknown)}")
+            if len(set(usernames)) != len(usernames):
+                raise AllocationError("A member appears more than once in splits.")
+
+            shares = split_amount(amount, split_type, values)
+            for share in shares:
+                _check_field(Split, 'amount', share, "Share")
+
+            try:
+                created_at = _parse_date(str(row.get('date') or '').strip())
+            except ValueError:
+                raise AllocationError(f"Invalid date: {row.get('date')!r}")
+            if created_at is not None and archived_until is not None and created_at <= archived_until:
+                raise AllocationError(
+                    f"Date {row.get('date')} is in archived history (up to {archived_until:%Y-%m-%d})."
+                )
+        except AllocationError as e:
+            errors.append((line, str(e)))
+            continue
+
+        plans.append({
+            'description': description,
+            'amount': amount,
+            'paid_by_id': members[payer],
+            'payer': payer,
+            'shares': [(members[u], s) for u, s in zip(usernames, shares)],
+            'created_at': created_at,
+        })
+
+    if errors:
+        raise ImportValidationError(errors)
+    return plans
+
+
+@transaction.atomic
+def write_expenses(group, imported_by, plans):
+    """Bulk-inserts validated plans; returns the new expense ids."""
+
+    seqs = reserve_seqs(group, sum(len(p['shares']) + 2 for p in plans))
+
+    expenses = Expense.objects.bulk_create([
+        Expense(
+            group=group, description=p['description'], amount=p['amount'],
+            paid_by_id=p['paid_by_id'], seq=next(seqs),
+        )
+        for p in plans
+    ], batch_size=BATCH_SIZE)
+
+    backdated = []
+    for expense, plan in zip(expenses, plans):
+        if plan['created_at'] is not None:
+            expense.created_at = plan['created_at']
+            backdated.append(expense)
+    if backdated:
+        Expense.objects.bulk_update(backdated, ['created_at'], batch_size=BATCH_SIZE)
+        invalidate_checkpoints(group.id, min(e.created_at for e in backdated))
+
+    Split.objects.bulk_create([
+        Split(expense_id=expense.id, group_id=group.id, user_id=user_id, amount=share, seq=next(seqs))
+        for expense, plan in zip(expenses, plans)
+        for user_id, share in plan['shares']
+    ], batch_size=BATCH_SIZE)
+
+    deltas = defaultdict(int)
+    for plan in plans:
+        deltas[plan['paid_by_id']] += to_minor(plan['amount'])
+        for user_id, share in plan['shares']:
+            deltas[user_id] -= to_minor(share)
+    apply_balance_deltas(group, deltas)
+
+    Activity.objects.bulk_create([
+        Activity(
+            group_id=group.id,
+            user_id=imported_by.id,
+            message=f'{imported_by.username} imported expense "{p["description"]}" ₹{p["amount"]} paid by {p["payer"]}',
+            seq=next(seqs),
+        )
+        for p in plans
+    ], batch_size=BATCH_SIZE)
+
+    # bulk_create skips the post_save signals that normally do this
+    invalidate_group(group.id)
+    return [e.id for e in expenses]
+
+
+def import_expenses(group, imported_by, stream, fmt='csv'):
+    """Validates and imports every row from `stream`, all or nothing."""
+
+    started = time.perf_counter()
+    plans = validate_rows(group, read_rows(stream, fmt))
+    expense_ids = write_expenses(group, imported_by, plans)
+    return ImportResult(len(plans), time.perf_counter() - started, expense_ids)
+
+
+def open_text(uploaded_file):
+    """Wraps an uploaded (binary) file as text, accepting a UTF-8 BOM."""
+
+    return io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from expenses.archive import archive_period, settled_cutoff
+from expenses.checkpoints import build_checkpoints
+from expenses.models import Group
+
+
+class Command(BaseCommand):
+    help = "Move each group's history up to its latest fully settled checkpoint into a compressed archive file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_ids', nargs='*', type=int, help="Limit to these group ids (default: all groups).")
+        parser.add_argument('--min-age', type=int, default=90,
+                            help="Only archive history older than this many days (default 90).")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be archived; change nothing.")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['min_age'])
+        groups = Group.objects.order_by('id')
+        if options['group_ids']:
+            groups = groups.filter(id__in=options['group_ids'])
+
+        archived = 0
+        for group in groups.iterator():
+            # the settled points are found among the monthly checkpoints;
+            # a dry run builds them only to look and rolls them back
+            with transaction.atomic():
+                build_checkpoints(group)
+                cutoff = settled_cutoff(group, before)
+                transaction.set_rollback(options['dry_run'])
+            if cutoff is None:
+                continue
+            if options['dry_run']:
+                self.stdout.write(f"Group {group.id} ({group.name}): would archive up to {cutoff:%Y-%m-%d}")
+                continue
+
+            period = archive_period(group, cutoff)
+            if period is not None:
+                archived += 1
+                self.stdout.write(
+                    f"Group {group.id} ({group.name}): archived {period.expense_count} expenses, "
+                    f"{period.settlement_count} settlements up to {cutoff:%Y-%m-%d}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} period(s)."))
@@ -0,0 +1,141 @@
+import io
+import json
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from expenses.cache import bump_group_version
+from expenses.models import Group
+from expenses.pdf import render_group_pdf
+from expenses.utils import calculate_balances, simplify_debts
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, round(pct / 100 * (len(values) - 1)))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = "Time the balance utils and the main views on one group; prints JSON that can be diffed between commits."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=int, default=None, help="Group id (default: the group with the most expenses).")
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--only', nargs='+', default=None, help="Only run these benchmarks.")
+        parser.add_argument('--output', default=None, help="Write the JSON here instead of stdout.")
+
+    def handle(self, *args, **options):
+        group = self.pick_group(options['group'])
+        member = group.members.first()
+        client = Client()
+        client.force_login(member)
+
+        balances = calculate_balances(group)
+
+        def view(name):
+            url = reverse(name, args=[group.id])
+            return lambda: self.consume(client.get(url))
+
+        benchmarks = {
+            'calculate_balances[ledger]': lambda: calculate_balances(group),
+            'calculate_balances[aggregate]': lambda: calculate_balances(group, engine='aggregate'),
+            'calculate_balances[python]': lambda: calculate_balances(group, engine='python'),
+            'simplify_debts[greedy]': lambda: simplify_debts(balances, strategy='greedy'),
+            'simplify_debts[exact]': lambda: simplify_debts(balances, strategy='exact'),
+            # a version bump misses every cached entry of this group only;
+            # the cache may be shared with a running site
+            'group_detail[cold]': (lambda: bump_group_version(group.id), view('group_detail')),
+            'group_detail[warm]': view('group_detail'),
+            'export_group_csv': view('export_group_csv'),
+            'render_group_pdf': lambda: render_group_pdf(group, io.BytesIO()),
+        }
+        if options['only']:
+            unknown = set(options['only']) - set(benchmarks)
+            if unknown:
+                raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+            benchmarks = {k: v for k, v in benchmarks.items() if k in options['only']}
+
+        results = {
+            'commit': self.commit(),
+            'group': {
+                'id': group.id,
+                'members': group.members.count(),
+                'expenses': group.expenses.count(),
+                'settlements': group.settlements.count(),
+            },
+            'repeat': options['repeat'],
+            'results': {},
+        }
+        for name, bench in benchmarks.items():
+            setup, func = bench if isinstance(bench, tuple) else (None, bench)
+            results['results'][name] = self.run(func, setup, options['repeat'])
+            self.stderr.write(f"{name:<32} p50 {results['results'][name]['p50_ms']:>9.2f} ms")
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def pick_group(self, group_id):
+        groups = Group.objects.all()
+        if group_id is not None:
+            groups = groups.filter(id=group_id)
+        group = groups.annotate(n=Count('expenses')).order_by('-n', 'id').first()
+        if group is None:
+            raise CommandError("No group to benchmark; run seed_benchmark first.")
+        return group
+
+    def consume(self, response):
+        if response.status_code != 200:
+            raise CommandError(f"{response.request['PATH_INFO']} returned {response.status_code}")
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def run(self, func, setup, repeat):
+        timings, queries = [], []
+        for _ in range(repeat):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as captured:
+                func()
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        # Peak memory comes from one extra traced run so tracing overhead
+        # doesn't skew the timings.
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'queries': max(queries),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,74 @@
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from expenses.models import Group, Expense, Split, Settlement
+from expenses.utils import calculate_balances, rebuild_balances
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare balance engines on a synthetic group. Everything is rolled back afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--splits', type=int, default=100_000)
+        parser.add_argument('--members', type=int, default=20)
+        parser.add_argument('--engines', nargs='+', default=['python', 'aggregate', 'ledger'])
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                group = self.build_group(options['members'], options['splits'])
+                for engine in options['engines']:
+                    self.bench(group, engine)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def build_group(self, member_count, split_count):
+        users = User.objects.bulk_create([
+            User(username=f"bench_balances_{i}") for i in range(member_count)
+        ])
+        group = Group.objects.create(name="bench_balances", created_by=users[0])
+        group.members.add(*users)
+
+        expense_count = max(split_count // member_count, 1)
+        expenses = Expense.objects.bulk_create([
+            Expense(group=group, description=f"Expense {i}", amount=member_count, paid_by=users[i % member_count])
+            for i in range(expense_count)
+        ], batch_size=2000)
+        Split.objects.bulk_create([
+            Split(expense=expense, group=group, user=user, amount=1)
+            for expense in expenses for user in users
+        ], batch_size=5000)
+        Settlement.objects.bulk_create([
+            Settlement(group=group, paid_by=users[i], paid_to=users[0], amount=1)
+            for i in range(1, member_count)
+        ])
+
+        # the ledger engine needs its rows in place too
+        rebuild_balances(group)
+
+        self.stdout.write(f"Group with {member_count} members, {expense_count} expenses, {expense_count * member_count} splits")
+        return group
+
+    def bench(self, group, engine):
+        tracemalloc.start()
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            calculate_balances(group, engine=engine)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"{engine:>10}: {elapsed * 1000:9.1f} ms  "
+            f"{len(queries):3d} queries  peak {peak / 1024 / 1024:7.2f} MiB"
+        )
@@ -0,0 +1,60 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from expenses.money import from_minor
+from expenses.settlement import PLANNERS
+
+
+def random_balances(size, rng):
+    """Net balances for `size` members built from small zero-sum clusters,
+    which is what real groups (sub-trips, shared rooms) tend to look like."""
+
+    balances = {}
+    member = 0
+    while member < size:
+        cluster = min(rng.randint(2, 4), size - member)
+        if cluster < 2:
+            balances[member] = 0
+            break
+        amounts = [rng.randint(1, 500_00) * rng.choice((1, -1)) for _ in range(cluster - 1)]
+        amounts.append(-sum(amounts))
+        for amount in amounts:
+            balances[member] = amount
+            member += 1
+    return {m: from_minor(a) for m, a in balances.items()}
+
+
+class Command(BaseCommand):
+    help = "Compare settlement planners: transfer counts and latency over groups of various sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10, 25, 50, 100, 250, 500])
+        parser.add_argument('--trials', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--time-budget', type=float, default=None)
+        parser.add_argument('--max-members', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        exact_options = {
+            'time_budget': options['time_budget'],
+            'max_members': options['max_members'],
+        }
+
+        self.stdout.write(f"{'size':>5} {'planner':>8} {'transfers':>10} {'p50 ms':>9} {'max ms':>9}")
+        for size in options['sizes']:
+            cases = [random_balances(size, rng) for _ in range(options['trials'])]
+            for name, planner in PLANNERS.items():
+                counts, timings = [], []
+                for balances in cases:
+                    started = time.perf_counter()
+                    plan = planner(balances, **exact_options) if name == 'exact' else planner(balances)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    counts.append(len(plan))
+                self.stdout.write(
+                    f"{size:>5} {name:>8} {statistics.mean(counts):>10.1f} "
+                    f"{statistics.median(timings):>9.2f} {max(timings):>9.2f}"
+                )
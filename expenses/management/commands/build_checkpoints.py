@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from expenses.checkpoints import PERIODS, build_checkpoints
+from expenses.models import Group
+
+
+class Command(BaseCommand):
+    help = "Snapshot each group's balances at every period boundary since its last checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_ids', nargs='*', type=int, help="Limit to these group ids (default: all groups).")
+        parser.add_argument('--period', choices=PERIODS, default='month')
+        parser.add_argument('--rebuild', action='store_true', help="Drop existing checkpoints first.")
+
+    def handle(self, *args, **options):
+        groups = Group.objects.order_by('id')
+        if options['group_ids']:
+            groups = groups.filter(id__in=options['group_ids'])
+
+        total = 0
+        for group in groups.iterator():
+            if options['rebuild']:
+                group.checkpoints.all().delete()
+            built = build_checkpoints(group, period=options['period'])
+            if built:
+                total += len(built)
+                self.stdout.write(
+                    f"Group {group.id} ({group.name}): {len(built)} checkpoint(s) up to {built[-1].as_of:%Y-%m-%d}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Built {total} checkpoint(s)."))
@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.importer import ImportValidationError, detect_format, import_expenses
+from expenses.models import Group
+
+
+class Command(BaseCommand):
+    help = "Bulk import expenses into a group from a CSV or NDJSON file (all rows or none)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], default=None,
+                            help="Defaults to ndjson for .ndjson/.jsonl/.json files, csv otherwise.")
+        parser.add_argument('--as-user', default=None,
+                            help="Username recorded in the activity log (default: the group's creator).")
+
+    def handle(self, *args, **options):
+        try:
+            group = Group.objects.get(id=options['group_id'])
+        except Group.DoesNotExist:
+            raise CommandError(f"Group {options['group_id']} does not exist.")
+
+        if options['as_user']:
+            try:
+                imported_by = User.objects.get(username=options['as_user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['as_user']!r} does not exist.")
+        else:
+            imported_by = group.created_by
+
+        fmt = options['format'] or detect_format(options['path'])
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            try:
+                result = import_expenses(group, imported_by, stream, fmt)
+            except ImportValidationError as e:
+                for line, message in e.errors:
+                    self.stderr.write(f"line {line}: {message}")
+                raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.rows} expenses in {result.seconds:.2f}s "
+            f"({result.rows_per_second:,.0f} rows/s)"
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.cache import invalidate_group
+from expenses.models import Group
+from expenses.utils import aggregate_totals, ledger_totals, rebuild_balances
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify) the MemberBalance ledger from raw expenses, splits and settlements."
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_ids', nargs='*', type=int, help="Limit to these group ids (default: all groups).")
+        parser.add_argument('--verify', action='store_true', help="Only report groups whose ledger disagrees; don't write.")
+
+    def handle(self, *args, **options):
+        groups = Group.objects.order_by('id')
+        if options['group_ids']:
+            groups = groups.filter(id__in=options['group_ids'])
+
+        mismatched = 0
+        for group in groups.iterator():
+            if not options['verify']:
+                rebuild_balances(group)
+                invalidate_group(group.id)
+                self.stdout.write(f"Rebuilt balances for group {group.id} ({group.name})")
+                continue
+
+            stored = ledger_totals(group)
+            replayed = aggregate_totals(group)
+            diff = {
+                user_id: (stored.get(user_id, 0), replayed.get(user_id, 0))
+                for user_id in stored.keys() | replayed.keys()
+                if stored.get(user_id, 0) != replayed.get(user_id, 0)
+            }
+            if diff:
+                mismatched += 1
+                self.stdout.write(self.style.ERROR(f"Group {group.id} ({group.name}) ledger mismatch:"))
+                for user_id, (have, want) in sorted(diff.items()):
+                    self.stdout.write(f"  user {user_id}: stored {have}, expected {want}")
+
+        if options['verify']:
+            if mismatched:
+                raise CommandError(f"{mismatched} group(s) have an out-of-date balance ledger.")
+            self.stdout.write(self.style.SUCCESS("All balance ledgers match."))
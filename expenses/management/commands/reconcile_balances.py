@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.cache import invalidate_group
+from expenses.models import Group
+from expenses.utils import rebuild_balances
+
+
+class Command(BaseCommand):
+    help = "Recompute every group's balances in one vectorised pass (NumPy) and report ledgers that disagree."
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_ids', nargs='*', type=int, help="Limit to these group ids (default: all groups).")
+        parser.add_argument('--fix', action='store_true', help="Rebuild the ledger of every mismatched group.")
+
+    def handle(self, *args, **options):
+        try:
+            from expenses.reconcile import reconcile
+            import numpy  # noqa: F401
+        except ImportError:
+            raise CommandError("reconcile_balances needs NumPy: pip install numpy")
+
+        started = time.perf_counter()
+        mismatched, rows = reconcile(options['group_ids'] or None)
+        self.stdout.write(f"Scanned {rows} rows in {time.perf_counter() - started:.2f}s")
+
+        groups = Group.objects.in_bulk(list(mismatched))
+        for group_id, diff in sorted(mismatched.items()):
+            group = groups.get(group_id)
+            self.stdout.write(self.style.ERROR(f"Group {group_id} ({group.name if group else 'deleted'}) ledger mismatch:"))
+            for user_id, (have, want) in sorted(diff.items()):
+                self.stdout.write(f"  user {user_id}: stored {have}, expected {want}")
+            if options['fix'] and group:
+                rebuild_balances(group)
+                invalidate_group(group_id)
+                self.stdout.write("  rebuilt")
+
+        if mismatched and not options['fix']:
+            raise CommandError(f"{len(mismatched)} group(s) have an out-of-date balance ledger.")
+        self.stdout.write(self.style.SUCCESS("All balance ledgers match." if not mismatched else "Fixed."))
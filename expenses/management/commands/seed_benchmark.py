@@ -0,0 +1,113 @@
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from expenses.cache import invalidate_group
+from expenses.importer import write_expenses
+from expenses.models import Activity, Group, Settlement
+from expenses.money import split_amount
+from expenses.utils import apply_balance_deltas, reserve_seqs
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic users, groups, expenses and settlements for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--members', type=int, default=10, help="Members per group.")
+        parser.add_argument('--expenses', type=int, default=1000, help="Expenses per group.")
+        parser.add_argument('--unequal', type=float, default=0.3, help="Share of expenses split unequally (0-1).")
+        parser.add_argument('--settlements', type=int, default=20, help="Settlements per group.")
+        parser.add_argument('--prefix', default='bench', help="Prefix for generated usernames and group names.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        started = time.perf_counter()
+
+        users = list(User.objects.filter(username__startswith=f"{prefix}_user_").order_by('id'))
+        existing = {u.username for u in users}
+        users += User.objects.bulk_create([
+            User(username=f"{prefix}_user_{i}")
+            for i in range(options['users'])
+            if f"{prefix}_user_{i}" not in existing
+        ])
+        users = users[:options['users']]
+
+        start = Group.objects.filter(name__startswith=f"{prefix}_group_").count()
+        for n in range(start, start + options['groups']):
+            members = rng.sample(users, min(options['members'], len(users)))
+            group = Group.objects.create(name=f"{prefix}_group_{n}", created_by=members[0])
+            group.members.add(*members)
+
+            write_expenses(group, members[0], [
+                self.expense_plan(rng, members, i, options['unequal'])
+                for i in range(options['expenses'])
+            ])
+            self.settle(rng, group, members, options['settlements'])
+            self.stdout.write(f"Seeded {group.name} (id {group.id})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['groups']} groups in {time.perf_counter() - started:.1f}s"
+        ))
+
+    def expense_plan(self, rng, members, i, unequal_ratio):
+        payer = rng.choice(members)
+        amount = Decimal(rng.randint(100, 500_000)) / 100
+        if rng.random() < unequal_ratio:
+            split_type = rng.choice(['unequal', 'percentage', 'shares'])
+            involved = rng.sample(members, rng.randint(1, len(members)))
+            if split_type == 'unequal':
+                values = [str(s) for s in split_amount(amount, 'shares', [rng.randint(1, 5) for _ in involved])]
+            elif split_type == 'percentage':
+                values = [str(s) for s in split_amount(Decimal(100), 'shares', [rng.randint(1, 5) for _ in involved])]
+            else:
+                values = [str(rng.randint(1, 5)) for _ in involved]
+        else:
+            split_type = 'equal'
+            involved = members
+            values = ['0'] * len(members)
+
+        shares = split_amount(amount, split_type, values)
+        return {
+            'description': f"Benchmark expense {i}",
+            'amount': amount,
+            'paid_by_id': payer.id,
+            'payer': payer.username,
+            'shares': [(m.id, s) for m, s in zip(involved, shares)],
+            'created_at': None,
+        }
+
+    @transaction.atomic
+    def settle(self, rng, group, members, count):
+        if len(members) < 2 or count < 1:
+            return
+        seqs = reserve_seqs(group, count * 2)
+        deltas = defaultdict(int)
+        settlements = []
+        for _ in range(count):
+            paid_by, paid_to = rng.sample(members, 2)
+            amount = rng.randint(100, 50_000)
+            deltas[paid_by.id] += amount
+            deltas[paid_to.id] -= amount
+            settlements.append(Settlement(
+                group=group, paid_by=paid_by, paid_to=paid_to,
+                amount=Decimal(amount) / 100, seq=next(seqs),
+            ))
+        Settlement.objects.bulk_create(settlements)
+        Activity.objects.bulk_create([
+            Activity(
+                group=group, user=s.paid_by, seq=next(seqs),
+                message=f'{s.paid_by.username} settled ₹{s.amount} with {s.paid_to.username}',
+            )
+            for s in settlements
+        ])
+        apply_balance_deltas(group, deltas)
+        invalidate_group(group.id)
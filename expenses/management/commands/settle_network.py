@@ -0,0 +1,33 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from expenses.network import plan_network
+
+
+class Command(BaseCommand):
+    help = "Plan cross-group settlements for every user, netting debts across all shared groups."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strategy', choices=['greedy', 'exact'], default=None)
+        parser.add_argument('--json', action='store_true', help="Print the transfers as JSON.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        transfers = plan_network(strategy=options['strategy'])
+        elapsed = time.perf_counter() - started
+
+        if options['json']:
+            usernames = dict(
+                User.objects.filter(id__in={u for t in transfers for u in t[:2]})
+                .values_list('id', 'username')
+            )
+            self.stdout.write(json.dumps([
+                {'from': usernames[debtor], 'to': usernames[creditor], 'amount': str(amount)}
+                for debtor, creditor, amount in transfers
+            ], indent=2))
+            return
+
+        self.stdout.write(f"{len(transfers)} transfers planned in {elapsed * 1000:.1f} ms")
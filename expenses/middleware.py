@@ -0,0 +1,185 @@
+"""
+Request middleware: replica read-your-writes stickiness, and opt-in
+per-request SQL and timing instrumentation.
+
+Enabled with settings.REQUEST_TIMING['ENABLED']. Every response gets a
+Server-Timing header splitting the request into DB, template render and
+remaining view time. Requests slower than SLOW_MS are logged to the
+'expenses.timing' logger as one JSON line with the slowest and the most
+repeated SQL statements, which is usually enough to spot an N+1.
+"""
+import contextvars
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+
+from .routers import read_replica
+
+logger = logging.getLogger('expenses.timing')
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = []
+        self.db = 0.0
+        self.render = 0.0
+        self.render_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.db += elapsed
+            self.queries.append((sql, elapsed))
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        timings = _current.get()
+        if timings is None or timings.render_depth:
+            return render(self, *args, **kwargs)
+        timings.render_depth += 1
+        # queries run by lazy querysets in the template count as DB time
+        db_before = timings.db
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timings.render_depth -= 1
+            timings.render += time.perf_counter() - started - (timings.db - db_before)
+
+    wrapper.timed = True
+    return wrapper
+
+
+def _instrument_templates():
+    if not getattr(Template.render, 'timed', False):
+        Template.render = _timed_render(Template.render)
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        options = settings.REQUEST_TIMING
+        if not options.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = options.get('SLOW_MS', 500)
+        self.top_sql = options.get('TOP_SQL', 5)
+        _instrument_templates()
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        view = max(total - timings.db - timings.render, 0.0)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timings.db * 1000:.1f};desc="{len(timings.queries)} queries"',
+            f'view;dur={view * 1000:.1f}',
+            f'render;dur={timings.render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        if total * 1000 >= self.slow_ms:
+            self.log_slow(request, response, timings, total, view)
+        return response
+
+    def log_slow(self, request, response, timings, total, view):
+        slowest = sorted(timings.queries, key=lambda q: q[1], reverse=True)[:self.top_sql]
+        repeated = Counter(sql for sql, _ in timings.queries).most_common(self.top_sql)
+        logger.warning(json.dumps({
+            'event': 'slow_request',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(timings.db * 1000, 1),
+            'view_ms': round(view * 1000, 1),
+            'render_ms': round(timings.render * 1000, 1),
+            'queries': len(timings.queries),
+            'slowest_sql': [{'sql': sql, 'ms': round(elapsed * 1000, 2)} for sql, elapsed in slowest],
+            'repeated_sql': [{'sql': sql, 'count': count} for sql, count in repeated if count > 1],
+        }))
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Lets @replica_reads views read from a replica on GET/HEAD, except for
+    REPLICA_STICKY_SECONDS after the browser's last unsafe request, so a
+    user always sees their own write even if the replica is behind. The
+    deadline lives in a cookie to avoid a session read on every request.
+    """
+
+    COOKIE = 'db_primary_until'
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sticky_seconds = settings.REPLICA_STICKY_SECONDS
+
+    def __call__(self, request):
+        request.read_replica = None
+        token = read_replica.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_replica.reset(token)
+
+        if response.streaming and request.read_replica:
+            # streamed exports run their queries after the view returns
+            response.streaming_content = _on_replica(response.streaming_content, request.read_replica)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                self.COOKIE, str(int(time.time()) + self.sticky_seconds),
+                max_age=self.sticky_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def pinned(self, request):
+        try:
+            return int(request.COOKIES.get(self.COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (getattr(view_func, 'replica_reads', False)
+                and request.method in ('GET', 'HEAD')
+                and not self.pinned(request)):
+            # authenticate against the primary: a session created moments
+            # ago may not have reached the replica yet
+            request.user.is_authenticated
+            request.read_replica = random.choice(settings.DATABASE_REPLICAS)
+            read_replica.set(request.read_replica)
+
+
+def _on_replica(content, alias):
+    chunks = iter(content)
+    while True:
+        token = read_replica.set(alias)
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            read_replica.reset(token)
+        yield chunk
@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-18 05:42
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_balances(apps, schema_editor):
+    Expense = apps.get_model('expenses', 'Expense')
+    Split = apps.get_model('expenses', 'Split')
+    Settlement = apps.get_model('expenses', 'Settlement')
+    MemberBalance = apps.get_model('expenses', 'MemberBalance')
+
+    balances = defaultdict(Decimal)
+    for group_id, user_id, amount in Expense.objects.values_list('group_id', 'paid_by_id', 'amount'):
+        balances[(group_id, user_id)] += amount
+    for group_id, user_id, amount in Split.objects.values_list('expense__group_id', 'user_id', 'amount'):
+        balances[(group_id, user_id)] -= amount
+    for group_id, paid_by_id, paid_to_id, amount in Settlement.objects.values_list(
+        'group_id', 'paid_by_id', 'paid_to_id', 'amount'
+    ):
+        balances[(group_id, paid_by_id)] += amount
+        balances[(group_id, paid_to_id)] -= amount
+
+    MemberBalance.objects.bulk_create([
+        MemberBalance(group_id=group_id, user_id=user_id, amount=amount)
+        for (group_id, user_id), amount in balances.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0003_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='member_balances', to='expenses.group')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='member_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('group', 'user'), name='unique_member_balance')],
+            },
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
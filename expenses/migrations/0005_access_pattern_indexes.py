@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 05:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0004_memberbalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['group', '-created_at', '-id'], name='activity_group_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['group', '-created_at', '-id'], name='expense_group_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='settlement',
+            index=models.Index(fields=['group', '-created_at', '-id'], name='settlement_group_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='split',
+            index=models.Index(fields=['expense', 'user'], name='split_expense_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='split',
+            index=models.Index(fields=['user'], name='split_user_idx'),
+        ),
+    ]
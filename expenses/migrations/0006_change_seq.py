@@ -0,0 +1,82 @@
+# Generated by Django 6.0 on 2026-10-18 05:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_seq(apps, schema_editor):
+    """Number each group's existing rows in creation order."""
+    Group = apps.get_model('expenses', 'Group')
+    Expense = apps.get_model('expenses', 'Expense')
+    Split = apps.get_model('expenses', 'Split')
+    Settlement = apps.get_model('expenses', 'Settlement')
+    Activity = apps.get_model('expenses', 'Activity')
+
+    for group in Group.objects.iterator():
+        seq = 0
+        for model, rows in (
+            (Expense, Expense.objects.filter(group=group)),
+            (Split, Split.objects.filter(expense__group=group)),
+            (Settlement, Settlement.objects.filter(group=group)),
+            (Activity, Activity.objects.filter(group=group)),
+        ):
+            rows = list(rows.order_by('id').only('id'))
+            for row in rows:
+                seq += 1
+                row.seq = seq
+            model.objects.bulk_update(rows, ['seq'], batch_size=1000)
+        group.change_seq = seq
+        group.save(update_fields=['change_seq'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0005_access_pattern_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='settlement',
+            name='seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='split',
+            name='seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['group', 'seq'], name='activity_group_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['group', 'seq'], name='expense_group_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='settlement',
+            index=models.Index(fields=['group', 'seq'], name='settlement_group_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='split',
+            index=models.Index(fields=['seq'], name='split_seq_idx'),
+        ),
+        migrations.RunPython(backfill_seq, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_change_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='settlement',
+            name='client_token',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 07:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0008_balancecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(blank=True, null=True)),
+                ('end', models.DateTimeField()),
+                ('path', models.CharField(max_length=255)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('split_count', models.PositiveIntegerField(default=0)),
+                ('settlement_count', models.PositiveIntegerField(default=0)),
+                ('activity_count', models.PositiveIntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_periods', to='expenses.group')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('group', 'end'), name='unique_archived_period')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-18 14:20
+
+from django.conf import settings
+from django.db import migrations
+
+# Member autocomplete filters with username__istartswith, which PostgreSQL
+# runs as UPPER("username"::text) LIKE UPPER('prefix%'). The unique index
+# on auth_user.username can't serve that (case folding, and LIKE needs a
+# pattern opclass under non-C collations), so index the same expression.
+# Other backends keep the plain scan; they're only used in development.
+INDEX = 'expenses_username_upper_prefix_idx'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        table = schema_editor.quote_name(apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table)
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDEX} ON {table} (UPPER("username"::text) text_pattern_ops)'
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0009_archivedperiod'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
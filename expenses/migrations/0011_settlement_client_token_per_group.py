@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0010_username_prefix_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='settlement',
+            name='client_token',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='settlement',
+            constraint=models.UniqueConstraint(fields=('group', 'client_token'), name='unique_settlement_client_token'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-18 16:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_group(apps, schema_editor):
+    Expense = apps.get_model('expenses', 'Expense')
+    Split = apps.get_model('expenses', 'Split')
+    Split.objects.update(group_id=Subquery(
+        Expense.objects.filter(pk=OuterRef('expense_id')).values('group_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0011_settlement_client_token_per_group'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='split',
+            name='group',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='splits', to='expenses.group'),
+        ),
+        migrations.RunPython(backfill_group, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='split',
+            name='group',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='splits', to='expenses.group'),
+        ),
+        migrations.RemoveIndex(
+            model_name='split',
+            name='split_seq_idx',
+        ),
+        migrations.AddIndex(
+            model_name='split',
+            index=models.Index(fields=['group', 'seq'], name='split_group_seq_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 17:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0013_deletedrow'),
+    ]
+
+    # the ForeignKey index on split.user_id already covers (user)
+    operations = [
+        migrations.RemoveIndex(
+            model_name='split',
+            name='split_user_idx',
+        ),
+    ]
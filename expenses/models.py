@@ -16,6 +16,10 @@ class Group(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # last sequence number handed out to a write in this group; bumped
+    # under the group's row lock so commit order follows sequence order
+    change_seq = models.BigIntegerField(default=0)
+
     def __str__(self):
         return self.name
 
@@ -34,6 +38,14 @@ class Expense(models.Model):
         related_name='paid_expenses'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # position in the group's change feed (see Group.change_seq)
+    seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', '-created_at', '-id'], name='expense_group_recent_idx'),
+            models.Index(fields=['group', 'seq'], name='expense_group_seq_idx'),
+        ]
 
     def __str__(self):
         return f"{self.description} - {self.amount}"
@@ -45,12 +57,32 @@ class Split(models.Model):
         on_delete=models.CASCADE,
         related_name='splits'
     )
+    # the expense's group, copied so the change feed can read a group's
+    # splits by (group, seq) without joining through every group's expenses
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='splits',
+        editable=False,
+    )
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='splits'
     )
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # position in the group's change feed (see Group.change_seq)
+    seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expense', 'user'], name='split_expense_user_idx'),
+            models.Index(fields=['group', 'seq'], name='split_group_seq_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.group_id = self.expense.group_id
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} owes {self.amount} for {self.expense.description}"
@@ -77,6 +109,22 @@ class Settlement(models.Model):
 
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
+    # position in the group's change feed (see Group.change_seq)
+    seq = models.BigIntegerField(default=0)
+    # set by the settle form so a double submit records one settlement
+    client_token = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', '-created_at', '-id'], name='settlement_group_recent_idx'),
+            models.Index(fields=['group', 'seq'], name='settlement_group_seq_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'client_token'],
+                name='unique_settlement_client_token'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.paid_by.username} paid {self.paid_to.username} ₹{self.amount}"
@@ -94,6 +142,140 @@ class Activity(models.Model):
     )
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # position in the group's change feed (see Group.change_seq)
+    seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', '-created_at', '-id'], name='activity_group_recent_idx'),
+            models.Index(fields=['group', 'seq'], name='activity_group_seq_idx'),
+        ]
 
     def __str__(self):
         return self.message
+
+
+class MemberBalance(models.Model):
+    """
+    Running net balance of one member in one group.
+    +ve => others owe this user
+    -ve => this user owes others
+    """
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='member_balances'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='member_balances'
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'user'],
+                name='unique_member_balance'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} in {self.group.name}: ₹{self.amount}"
+
+
+class BalanceCheckpoint(models.Model):
+    """
+    Snapshot of every member's net balance in a group, covering all
+    expenses and settlements created before `as_of`. Balances at a later
+    point are this snapshot plus the rows created since (see
+    expenses.checkpoints).
+    """
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='checkpoints'
+    )
+    as_of = models.DateTimeField()
+    # {user_id: net paise}
+    balances = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'as_of'],
+                name='unique_group_checkpoint'
+            ),
+        ]
+
+    def totals(self):
+        """{user_id: paise} with the JSON string keys turned back into ids."""
+        return {int(user_id): amount for user_id, amount in self.balances.items()}
+
+    def __str__(self):
+        return f"{self.group.name} as of {self.as_of:%Y-%m-%d}"
+
+
+class ArchivedPeriod(models.Model):
+    """
+    Carry-forward summary of a settled stretch of a group's history whose
+    Expense, Split, Settlement and Activity rows were moved to a
+    compressed file (see expenses.archive). Every balance was zero at
+    `end`, so the live rows alone still add up to the right balances.
+    """
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='archived_periods'
+    )
+    # rows created in [start, end) were archived; start is None for the first period
+    start = models.DateTimeField(null=True, blank=True)
+    end = models.DateTimeField()
+    # relative to settings.ARCHIVE_ROOT
+    path = models.CharField(max_length=255)
+    expense_count = models.PositiveIntegerField(default=0)
+    split_count = models.PositiveIntegerField(default=0)
+    settlement_count = models.PositiveIntegerField(default=0)
+    activity_count = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'end'],
+                name='unique_archived_period'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.group.name} up to {self.end:%Y-%m-%d}"
+
+
+class DeletedRow(models.Model):
+    """
+    Tombstone for an Expense, Split or Settlement deleted after it was
+    written (admin deletes, cascades), so the change feed can tell a
+    client to drop its copy. A deleted expense takes its splits with it.
+    """
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='deleted_rows'
+    )
+    # the deleted row's model name: expense, split or settlement
+    kind = models.CharField(max_length=16)
+    row_id = models.BigIntegerField()
+    # position in the group's change feed (see Group.change_seq)
+    seq = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'seq'], name='deletedrow_group_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.row_id} deleted from {self.group.name}"
@@ -0,0 +1,154 @@
+"""
+Exact money arithmetic for splits and balances.
+
+Amounts are handled as integer minor units (paise) so that splitting,
+summing and netting never leave rounding dust behind. Decimal is only
+used at the edges: reading form/DB values and writing them back.
+"""
+from decimal import Decimal, DecimalException, ROUND_HALF_UP
+
+MINOR_UNITS = 100
+CENT = Decimal('0.01')
+
+# bounds on raw inputs, far beyond any real expense, so that Decimal
+# arithmetic on them can't overflow or build enormous integers
+MAX_DIGITS = 12
+MAX_PLACES = 8
+
+
+class AllocationError(ValueError):
+    """Raised when split inputs can't be turned into a valid allocation."""
+
+
+def to_minor(value):
+    """Decimal / str / int amount -> integer paise (half-up to the paisa)."""
+
+    if isinstance(value, float):
+        value = repr(value)
+    amount = parse_number(value, f"Invalid amount: {value!r}")
+    return int((amount * MINOR_UNITS).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def parse_number(value, message, places=None):
+    """
+    A finite Decimal of sane size from raw input, or AllocationError
+    (message). Guards against NaN / Infinity and inputs like 1e999999999
+    that Decimal accepts but can't compute with. With `places`, more
+    significant decimal places than that are rejected too.
+    """
+
+    try:
+        number = Decimal(value)
+    except (DecimalException, TypeError, ValueError):
+        raise AllocationError(message)
+    # checked on the representation: arithmetic on such values can
+    # itself overflow
+    if not number.is_finite() or number.adjusted() >= MAX_DIGITS:
+        raise AllocationError(message)
+    if places is not None and number and number.normalize().as_tuple().exponent < -places:
+        raise AllocationError(message)
+    return number
+
+
+def from_minor(minor):
+    """Integer paise -> 2-place Decimal."""
+
+    return (Decimal(minor) / MINOR_UNITS).quantize(CENT)
+
+
+def _integer_weights(weights):
+    """Scales (possibly fractional) weights to integers with the same ratios."""
+
+    if all(isinstance(w, int) for w in weights):
+        return list(weights)
+    decimals = [Decimal(w) if isinstance(w, (int, Decimal)) else Decimal(str(w)) for w in weights]
+    if not all(d.is_finite() for d in decimals):
+        raise AllocationError("Weights must be finite numbers.")
+    places = max(0, -min(d.as_tuple().exponent for d in decimals))
+    return [int(d.scaleb(places)) for d in decimals]
+
+
+def allocate(total, weights):
+    """
+    Splits `total` paise in proportion to `weights` with the largest-
+    remainder method. Every member gets the floor of their exact quota;
+    the paise left over go to the largest fractional remainders (ties
+    go to the earlier member). The result always sums to `total`.
+    All arithmetic is on integers.
+    """
+
+    weights = _integer_weights(weights)
+    if not weights:
+        raise AllocationError("Nobody to split between.")
+    if any(w < 0 for w in weights):
+        raise AllocationError("Weights can't be negative.")
+    weight_sum = sum(weights)
+    if weight_sum == 0:
+        raise AllocationError("At least one weight must be positive.")
+
+    shares, remainders = [], []
+    for w in weights:
+        share, remainder = divmod(total * w, weight_sum)
+        shares.append(share)
+        remainders.append(remainder)
+    leftover = total - sum(shares)
+
+    by_remainder = sorted(range(len(weights)), key=lambda i: (-remainders[i], i))
+    for i in by_remainder[:leftover]:
+        shares[i] += 1
+    return shares
+
+
+def split_equal(total, count):
+    return allocate(total, [1] * count)
+
+
+def split_exact(total, amounts):
+    shares = [to_minor(a) for a in amounts]
+    if any(s < 0 for s in shares):
+        raise AllocationError("Shares can't be negative.")
+    if sum(shares) != total:
+        raise AllocationError(
+            f"Total shares ({from_minor(sum(shares))}) must equal expense amount ({from_minor(total)})."
+        )
+    return shares
+
+
+def split_percentage(total, percentages):
+    percentages = [parse_number(p, "Percentages must be numbers.", MAX_PLACES) for p in percentages]
+    if sum(percentages) != 100:
+        raise AllocationError(f"Percentages add up to {sum(percentages)}%, not 100%.")
+    return allocate(total, percentages)
+
+
+def split_weights(total, weights):
+    weights = [parse_number(w, "Shares must be numbers.", MAX_PLACES) for w in weights]
+    return allocate(total, weights)
+
+
+SPLITTERS = {
+    'equal': lambda total, values: split_equal(total, len(values)),
+    'unequal': split_exact,
+    'percentage': split_percentage,
+    'shares': split_weights,
+}
+
+
+def split_amount(amount, split_type, values):
+    """
+    Splits a Decimal `amount` between members in one pass.
+    `values` holds one raw input per member (ignored for 'equal').
+    Returns a list of 2-place Decimals in the same order.
+    """
+
+    total = to_minor(amount)
+    if total <= 0:
+        raise AllocationError("Amount must be positive.")
+    if split_type not in SPLITTERS:
+        raise AllocationError(f"Unknown split type: {split_type}")
+    try:
+        shares = SPLITTERS[split_type](total, list(values))
+    except DecimalException:
+        # anything parse_number let through that Decimal still can't handle
+        raise AllocationError("Invalid split values.")
+    return [from_minor(share) for share in shares]
@@ -0,0 +1,74 @@
+"""
+Cross-group debt netting.
+
+Balances live per group, so two people who owe each other in different
+groups would otherwise settle each group separately. Here every ledger
+row for a set of groups is loaded in one query and:
+
+  pairwise_positions - nets each pair's debts (from the per-group plans)
+                       across all the groups they share
+  pair_transfers     - one transfer per pair left owing after that
+  plan_network       - both, for a set of groups
+
+Transfers only ever run between people who share a group: netting over
+everyone's totals could find fewer transfers, but would send money (and
+usernames) between strangers.
+"""
+from collections import defaultdict
+
+from .models import MemberBalance
+from .money import to_minor, from_minor
+from .settlement import plan_settlements
+
+
+def _ledger_rows(group_ids=None):
+    rows = MemberBalance.objects.exclude(amount=0)
+    if group_ids is not None:
+        rows = rows.filter(group_id__in=group_ids)
+    by_group = defaultdict(dict)
+    for group_id, user_id, amount in rows.values_list('group_id', 'user_id', 'amount').iterator(5000):
+        by_group[group_id][user_id] = to_minor(amount)
+    return by_group
+
+
+def pairwise_positions(group_ids=None, strategy='greedy'):
+    """
+    {(a, b): paise} with a < b; +ve means a owes b, -ve means b owes a,
+    after netting the per-group plans of every shared group.
+    """
+
+    pairs = defaultdict(int)
+    for balances in _ledger_rows(group_ids).values():
+        plan = plan_settlements({u: from_minor(a) for u, a in balances.items()}, strategy=strategy)
+        for debtor, creditor, amount in plan:
+            amount = to_minor(amount)
+            if debtor < creditor:
+                pairs[(debtor, creditor)] += amount
+            else:
+                pairs[(creditor, debtor)] -= amount
+    return {pair: amount for pair, amount in pairs.items() if amount}
+
+
+def pair_transfers(pairs):
+    """
+    [(debtor_id, creditor_id, amount)] settling each pair of
+    pairwise_positions() output directly.
+    """
+
+    transfers = []
+    for (a, b), amount in sorted(pairs.items()):
+        if amount > 0:
+            transfers.append((a, b, from_minor(amount)))
+        else:
+            transfers.append((b, a, from_minor(-amount)))
+    return transfers
+
+
+def plan_network(group_ids=None, strategy=None):
+    """
+    [(debtor_id, creditor_id, amount)] settling everyone's cross-group
+    position: each pair that shares a group settles its netted amount
+    directly, so every transfer agrees with pairwise_positions().
+    """
+
+    return pair_transfers(pairwise_positions(group_ids, strategy or 'greedy'))
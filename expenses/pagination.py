@@ -0,0 +1,65 @@
+"""
+Keyset (cursor) pagination over (created_at, id), newest first.
+
+Each page filters on the last row of the previous one instead of using
+OFFSET, so with the (group, -created_at, -id) indexes a deep page costs
+the same as the first. Cursors are opaque url-safe strings.
+"""
+import base64
+import json
+from dataclasses import dataclass
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+ORDERING = ('-created_at', '-id')
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(obj):
+    raw = json.dumps([obj.created_at.isoformat(), obj.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor, or None if it's missing or garbled."""
+
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        created_at = parse_datetime(created_at)
+    except (ValueError, TypeError):
+        return None
+    if created_at is None or not isinstance(pk, int):
+        return None
+    return created_at, pk
+
+
+def keyset_page(queryset, cursor=None, page_size=20):
+    """Returns the page of `queryset` that follows `cursor`."""
+
+    queryset = queryset.order_by(*ORDERING)
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1])
+    return KeysetPage(items, next_cursor)
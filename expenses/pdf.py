@@ -0,0 +1,243 @@
+"""
+The group summary PDF, drawn with ReportLab.
+
+Imported lazily by expenses.reports, so ReportLab's import time and
+memory are only paid by a process that renders a report.
+"""
+from datetime import datetime
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.lib.units import cm
+from reportlab.lib import colors
+from reportlab.platypus import Table, TableStyle
+
+from .cache import get_group_summary
+from .checkpoints import end_of_day
+
+
+def render_group_pdf(group, output, as_of=None):
+    """
+    Draws the group summary PDF into the file-like `output`; with `as_of`
+    (a date) only rows up to the end of that day are included.
+    """
+
+    expenses = group.expenses.select_related('paid_by').order_by('-created_at')
+    settlements = group.settlements.select_related('paid_by', 'paid_to').order_by('-created_at')
+    if as_of is not None:
+        expenses = expenses.filter(created_at__lt=end_of_day(as_of))
+        settlements = settlements.filter(created_at__lt=end_of_day(as_of))
+
+    p = canvas.Canvas(output, pagesize=A4)
+    width, height = A4
+    
+    # Starting position
+    y = height - 2 * cm
+    left_margin = 2 * cm
+    right_margin = width - 2 * cm
+
+    def draw_header():
+        """Draw the header section with title and date"""
+        nonlocal y
+        
+        # Title with background
+        p.setFillColorRGB(0.2, 0.4, 0.8)  # Blue background
+        p.rect(left_margin - 0.3*cm, y - 0.9*cm, right_margin - left_margin + 0.6*cm, 1.3*cm, fill=1, stroke=0)
+        
+        # White text on blue background
+        p.setFillColorRGB(1, 1, 1)
+        p.setFont("Helvetica-Bold", 18)
+        p.drawString(left_margin + 0.2*cm, y - 0.45*cm, f"Group Summary: {group.name}")
+        
+        # Date on the right
+        p.setFont("Helvetica", 10)
+        date_str = datetime.now().strftime("%B %d, %Y")
+        p.drawRightString(right_margin - 0.2*cm, y - 0.45*cm, f"Generated: {date_str}")
+        
+        y -= 2.8 * cm
+        p.setFillColorRGB(0, 0, 0)  # Reset to black
+
+    def draw_section_header(title):
+        """Draw a section header with underline"""
+        nonlocal y
+        if y < 6 * cm:  # Check if we need a new page (more conservative)
+            p.showPage()
+            y = height - 2 * cm
+        
+        # Add spacing before section
+        y -= 0.5 * cm
+        
+        p.setFont("Helvetica-Bold", 14)
+        p.setFillColorRGB(0.2, 0.4, 0.8)
+        p.drawString(left_margin, y, title)
+        
+        # Draw underline
+        p.setStrokeColorRGB(0.2, 0.4, 0.8)
+        p.setLineWidth(2)
+        p.line(left_margin, y - 0.15*cm, right_margin, y - 0.15*cm)
+        
+        y -= 0.9 * cm  # Spacing after header
+        p.setFillColorRGB(0, 0, 0)
+        p.setStrokeColorRGB(0, 0, 0)
+        p.setLineWidth(1)
+
+    def draw_text(text, indent=0, bold=False):
+        """Draw regular text with optional indent"""
+        nonlocal y
+        if y < 2 * cm:
+            p.showPage()
+            y = height - 2 * cm
+        
+        if bold:
+            p.setFont("Helvetica-Bold", 11)
+        else:
+            p.setFont("Helvetica", 11)
+        
+        p.drawString(left_margin + indent * cm, y, text)
+        y -= 0.6 * cm
+
+    def draw_table(data, col_widths=None):
+        """Draw a formatted table"""
+        nonlocal y
+        
+        if not data:
+            return
+        
+        # Default column widths if not specified
+        if col_widths is None:
+            col_widths = [width / len(data[0]) - 0.5*cm for _ in data[0]]
+        
+        # Calculate approximate table height (more accurate)
+        row_height = 0.75 * cm
+        table_height = len(data) * row_height + 0.5 * cm
+        
+        # Check if we need a new page
+        if y - table_height < 3.5 * cm:
+            p.showPage()
+            y = height - 2 * cm
+        
+        # Create table
+        table = Table(data, colWidths=col_widths, rowHeights=row_height)
+        
+        # Style the table
+        style = TableStyle([
+            # Header row
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3366CC')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ('TOPPADDING', (0, 0), (-1, 0), 10),
+            ('LEFTPADDING', (0, 0), (-1, -1), 10),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+            
+            # Data rows
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+            ('TOPPADDING', (0, 1), (-1, -1), 8),
+            
+            # Grid
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#3366CC')),
+            
+            # Alternating row colors
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F0F0F0')]),
+        ])
+        
+        table.setStyle(style)
+        
+        # Calculate actual table size
+        table_width, actual_height = table.wrap(width - 4*cm, height)
+        
+        # Draw the table
+        table.drawOn(p, left_margin, y - actual_height)
+        
+        # Update y position with actual height plus spacing
+        y -= actual_height + 1.5 * cm
+
+    # Start drawing the PDF
+    draw_header()
+    
+    # Members Section
+    draw_section_header("Group Members")
+    members_data = [['Username']]
+    for m in group.members.all():
+        members_data.append([m.username])
+    draw_table(members_data, col_widths=[10*cm])
+    
+    # Expenses Section
+    draw_section_header("Expenses")
+    if expenses.exists():
+        expenses_data = [['Description', 'Paid By', 'Amount (Rs.)']]
+        for e in expenses:
+            expenses_data.append([
+                e.description[:40],  # Truncate long descriptions
+                e.paid_by.username,
+                f"Rs. {e.amount:.2f}"
+            ])
+        draw_table(expenses_data, col_widths=[9*cm, 4*cm, 4*cm])
+    else:
+        draw_text("No expenses recorded yet.", indent=0.5)
+        y -= 0.5 * cm
+    
+    # Settlements Section
+    draw_section_header("Settlements")
+    if settlements.exists():
+        settlements_data = [['Paid By', 'Paid To', 'Amount (Rs.)']]
+        for s in settlements:
+            settlements_data.append([
+                s.paid_by.username,
+                s.paid_to.username,
+                f"Rs. {s.amount:.2f}"
+            ])
+        draw_table(settlements_data, col_widths=[5*cm, 5*cm, 4*cm])
+    else:
+        draw_text("No settlements recorded yet.", indent=0.5)
+        y -= 0.5 * cm
+    
+    # Final Balances Section
+    draw_section_header("Final Balances" if as_of is None else f"Balances as of {as_of:%B %d, %Y}")
+    summary = get_group_summary(group, as_of=as_of)
+    balances = summary['balances']
+    if balances:
+        balances_data = [['Member', 'Balance (Rs.)', 'Status']]
+        for user, amount in sorted(balances.items(), key=lambda x: x[1], reverse=True):
+            status = "Should Receive" if amount > 0 else "Owes" if amount < 0 else "Settled"
+            balances_data.append([
+                user.username,
+                f"Rs. {abs(amount):.2f}",
+                status
+            ])
+        draw_table(balances_data, col_widths=[6*cm, 4*cm, 5*cm])
+    else:
+        draw_text("No balance information available.", indent=0.5)
+        y -= 0.5 * cm
+    
+    # Who Should Pay Whom Section
+    draw_section_header("Settlement Recommendations")
+    transactions = summary['transactions']
+    if transactions:
+        transactions_data = [['From', 'To', 'Amount (Rs.)']]
+        for debtor, creditor, amount in transactions:
+            transactions_data.append([
+                debtor.username,
+                creditor.username,
+                f"Rs. {amount:.2f}"
+            ])
+        draw_table(transactions_data, col_widths=[5*cm, 5*cm, 4*cm])
+    else:
+        draw_text("✓ All settled! No pending payments.", indent=0.5, bold=True)
+    
+    # Footer
+    y = 1.5 * cm
+    p.setFont("Helvetica-Oblique", 9)
+    p.setFillColorRGB(0.5, 0.5, 0.5)
+    p.drawCentredString(width / 2, y, f"Generated by Splitwise - {group.name}")
+    
+    p.showPage()
+    p.save()
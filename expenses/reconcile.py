@@ -0,0 +1,109 @@
+"""
+Batch balance reconciliation across every group, vectorised with NumPy.
+
+Rather than one calculate_balances() per group, the raw rows of all
+groups are streamed as integer (group_id, user_id, paise) columns into
+NumPy arrays, once per table. The (group, user) pairs are packed into a
+single int64 key, sorted, and summed with np.add.reduceat, so every net
+balance comes out of one exact integer reduction. The same is done for
+the stored MemberBalance rows and the two are compared.
+
+NumPy is only needed here, so it is imported lazily.
+"""
+from collections import defaultdict
+from django.db import connections
+from django.db.models import BigIntegerField, F
+from django.db.models.functions import Cast, Round
+
+from .models import Expense, MemberBalance, Settlement, Split
+from .money import from_minor
+
+CHUNK_SIZE = 100_000
+USER_BITS = 32
+
+
+def _paise(field):
+    # rounded in SQL so the amounts arrive as plain integers
+    return Cast(Round(F(field) * 100), BigIntegerField())
+
+
+def _columns(np, qs):
+    """
+    Streams a (group_id, user_id, paise) values_list into an (n, 3) int64
+    array, fetching straight from the cursor to skip per-row model work.
+    """
+
+    sql, params = qs.order_by().query.sql_with_params()
+    chunks = []
+    with connections[qs.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while chunk := cursor.fetchmany(CHUNK_SIZE):
+            chunks.append(np.array(chunk, dtype=np.int64))
+    if not chunks:
+        return np.empty((0, 3), dtype=np.int64)
+    return np.concatenate(chunks)
+
+
+def _reduce(np, columns):
+    """Sums paise per (group_id, user_id): returns (keys, totals)."""
+
+    keys = (columns[:, 0] << USER_BITS) | columns[:, 1]
+    order = np.argsort(keys, kind='stable')
+    keys, amounts = keys[order], columns[order, 2]
+    if not len(keys):
+        return keys, amounts
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(amounts, starts)
+
+
+def _filtered(qs, group_ids, field='group_id'):
+    return qs.filter(**{f'{field}__in': group_ids}) if group_ids is not None else qs
+
+
+def raw_columns(np, group_ids=None):
+    """(group_id, user_id, +/-paise) for every balance-affecting row."""
+
+    sources = [
+        _filtered(Expense.objects, group_ids)
+        .values_list('group_id', 'paid_by_id', _paise('amount')),
+        _filtered(Split.objects, group_ids, 'expense__group_id')
+        .values_list('expense__group_id', 'user_id', -_paise('amount')),
+        _filtered(Settlement.objects, group_ids)
+        .values_list('group_id', 'paid_by_id', _paise('amount')),
+        _filtered(Settlement.objects, group_ids)
+        .values_list('group_id', 'paid_to_id', -_paise('amount')),
+    ]
+    return np.concatenate([_columns(np, qs) for qs in sources])
+
+
+def stored_columns(np, group_ids=None):
+    qs = _filtered(MemberBalance.objects, group_ids)
+    return _columns(np, qs.values_list('group_id', 'user_id', _paise('amount')))
+
+
+def reconcile(group_ids=None):
+    """
+    Compares every group's MemberBalance rows with a fresh recomputation.
+    Returns ({group_id: {user_id: (stored, expected)}}, rows_scanned) for
+    mismatched groups only; amounts are Decimals.
+    """
+
+    import numpy as np
+
+    raw = raw_columns(np, group_ids)
+    expected_keys, expected = _reduce(np, raw)
+    stored_keys, stored = _reduce(np, stored_columns(np, group_ids))
+
+    # line both sides up on the union of keys; a missing row counts as 0
+    keys = np.union1d(expected_keys, stored_keys)
+    want = np.zeros(len(keys), dtype=np.int64)
+    have = np.zeros(len(keys), dtype=np.int64)
+    want[np.searchsorted(keys, expected_keys)] = expected
+    have[np.searchsorted(keys, stored_keys)] = stored
+
+    mismatched = defaultdict(dict)
+    for i in np.flatnonzero(want != have):
+        key = int(keys[i])
+        group_id, user_id = key >> USER_BITS, key & ((1 << USER_BITS) - 1)
+        mismatched[group_id][user_id] = (from_minor(int(have[i])), from_minor(int(want[i])))
+    return dict(mismatched), len(raw)
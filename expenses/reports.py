@@ -0,0 +1,129 @@
+"""
+Background PDF report generation.
+
+Reports are rendered by a small thread pool and written to
+settings.REPORTS_ROOT under a name made from the group id and its
+change_seq, which every write moves on. The name only depends on the
+database, so every worker process agrees on it: as long as the group
+hasn't changed, the file on disk is the report and is served without
+re-rendering. The drawing itself lives in expenses.pdf, imported on
+first use.
+"""
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Group
+
+_executor = None
+_jobs = {}
+_lock = threading.Lock()
+
+
+# superseded reports are kept this long, for downloads and status polls
+# that were already pointed at them
+STALE_REPORT_SECONDS = 10 * 60
+
+
+def report_path(group_id, change_seq, as_of=None):
+    name = f"group-{group_id}-s{change_seq}"
+    if as_of is not None:
+        name += f"-{as_of.isoformat()}"
+    return Path(settings.REPORTS_ROOT) / f"{name}.pdf"
+
+
+def report_status(group, as_of=None):
+    """'ready', 'pending' or 'failed' for the group's current version."""
+
+    path = report_path(group.id, group.change_seq, as_of)
+    if path.exists():
+        return 'ready'
+    job = _jobs.get(path)
+    if job is not None and job.done() and job.exception() is not None:
+        return 'failed'
+    return 'pending'
+
+
+def request_report(group, as_of=None):
+    """
+    Makes sure a report for the group's current version (optionally as of
+    a date) exists or is being rendered. Returns its path. With
+    REPORT_WORKERS = 0 the report is rendered inline (used by tests and
+    single-process setups).
+    """
+
+    path = report_path(group.id, group.change_seq, as_of)
+    if path.exists():
+        return path
+
+    if settings.REPORT_WORKERS == 0:
+        build_report(group.id, path, as_of)
+        return path
+
+    global _executor
+    with _lock:
+        job = _jobs.get(path)
+        if job is None or (job.done() and job.exception() is not None):
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.REPORT_WORKERS,
+                    thread_name_prefix='pdf-report',
+                )
+            _jobs[path] = _executor.submit(_build_in_worker, group.id, path, as_of)
+    return path
+
+
+def _build_in_worker(group_id, path, as_of=None):
+    try:
+        build_report(group_id, path, as_of)
+    finally:
+        connection.close()
+        with _lock:
+            # keep failures around so report_status can report them
+            if path.exists():
+                _jobs.pop(path, None)
+
+
+def build_report(group_id, path, as_of=None):
+    """Renders the report to a temp file and atomically moves it into place."""
+
+    # ReportLab is only loaded by processes that actually render reports
+    from .pdf import render_group_pdf
+
+    group = Group.objects.get(id=group_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            render_group_pdf(group, output, as_of)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+    remove_stale_reports(group_id, path)
+
+
+def remove_stale_reports(group_id, path):
+    """
+    Deletes reports for older change_seqs than `path` (names are
+    group-<id>-s<seq>[-<as_of>].pdf) once they have been superseded for
+    STALE_REPORT_SECONDS; newer ones are never touched.
+    """
+
+    current = int(path.stem.split('-')[2][1:])
+    cutoff = time.time() - STALE_REPORT_SECONDS
+    for old in path.parent.glob(f"group-{group_id}-s*.pdf"):
+        try:
+            if int(old.stem.split('-')[2][1:]) < current and old.stat().st_mtime < cutoff:
+                old.unlink()
+        except (ValueError, FileNotFoundError):
+            # not one of ours, or removed by another process meanwhile
+            pass
@@ -0,0 +1,35 @@
+"""
+Read-replica routing.
+
+Reads go to a replica only while `read_replica` holds its alias, which
+ReplicaStickinessMiddleware sets for GET/HEAD requests to views marked
+with @replica_reads, unless the user wrote something in the last
+REPLICA_STICKY_SECONDS (read-your-writes). One replica is picked per
+request so its reads see a single snapshot. Everything else, including
+all writes, migrations and management commands, uses 'default'.
+"""
+import contextvars
+
+read_replica = contextvars.ContextVar('read_replica', default=None)
+
+
+def replica_reads(view):
+    """Marks a read-only view whose queries may be served by a replica."""
+
+    view.replica_reads = True
+    return view
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_replica.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,179 @@
+"""
+Settlement planners: turn net balances into a list of transfers.
+
+Every planner takes {member: amount} (+ve is owed money, -ve owes
+money) and returns [(debtor, creditor, amount)]. Amounts are matched
+in integer paise (see expenses.money).
+
+  greedy - repeatedly settles the largest debtor against the largest
+           creditor using two heaps. O(n log n), at most n - 1 transfers.
+  exact  - the true minimum number of transfers: members are split into
+           as many zero-sum subsets as possible (n - subsets transfers).
+           Exponential, so it is bounded by a member count and a time
+           budget and falls back to greedy when either is exceeded.
+"""
+import heapq
+import time
+
+from django.conf import settings
+
+from .money import to_minor, from_minor
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def _sort_key(member):
+    # works for User instances as well as plain ids
+    return getattr(member, 'pk', member)
+
+
+def _net_positions(balances):
+    """[(member, paise)] for non-zero balances, in a stable order."""
+
+    positions = [(member, to_minor(amount)) for member, amount in balances.items()]
+    positions = [(member, amount) for member, amount in positions if amount]
+    positions.sort(key=lambda p: _sort_key(p[0]))
+    return positions
+
+
+def _greedy(positions):
+    """Largest debtor pays largest creditor until both heaps are empty."""
+
+    creditors = [(-amount, i, member) for i, (member, amount) in enumerate(positions) if amount > 0]
+    debtors = [(amount, i, member) for i, (member, amount) in enumerate(positions) if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, ci, creditor = heapq.heappop(creditors)
+        debt, di, debtor = heapq.heappop(debtors)
+        credit, debt = -credit, -debt
+
+        amount = min(credit, debt)
+        transfers.append((debtor, creditor, amount))
+
+        if credit > amount:
+            heapq.heappush(creditors, (-(credit - amount), ci, creditor))
+        if debt > amount:
+            heapq.heappush(debtors, (-(debt - amount), di, debtor))
+    return transfers
+
+
+def _zero_sum_subsets(positions, deadline):
+    """
+    Partitions positions into the maximum number of zero-sum subsets.
+    dp[mask] is the most zero-sum "cuts" reachable by adding members of
+    mask one at a time; following the best chain back gives an order
+    whose zero prefix sums mark the subset boundaries.
+    """
+
+    n = len(positions)
+    amounts = [amount for _, amount in positions]
+    full = (1 << n) - 1
+
+    sums = [0] * (full + 1)
+    dp = [0] * (full + 1)
+    last = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        if not mask & 1023 and time.perf_counter() > deadline:
+            raise BudgetExceeded
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + amounts[low.bit_length() - 1]
+
+        best, best_i = -1, 0
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            if dp[mask ^ bit] > best:
+                best, best_i = dp[mask ^ bit], bit
+        dp[mask] = best + (1 if sums[mask] == 0 else 0)
+        last[mask] = best_i
+
+    order = []
+    mask = full
+    while mask:
+        order.append(last[mask].bit_length() - 1)
+        mask ^= last[mask]
+    order.reverse()
+
+    subsets, current, running = [], [], 0
+    for i in order:
+        current.append(positions[i])
+        running += amounts[i]
+        if running == 0:
+            subsets.append(current)
+            current = []
+    if current:
+        subsets.append(current)
+    return subsets
+
+
+def _exact(positions, max_members, time_budget):
+    deadline = time.perf_counter() + time_budget
+
+    # a debtor and creditor with exactly opposite amounts always form
+    # their own subset in some optimal plan, so pair those off first
+    transfers = []
+    unmatched_debtors = {}
+    rest = []
+    for member, amount in positions:
+        if amount < 0:
+            unmatched_debtors.setdefault(-amount, []).append((member, amount))
+    for member, amount in positions:
+        if amount > 0 and unmatched_debtors.get(amount):
+            debtor, _ = unmatched_debtors[amount].pop(0)
+            transfers.append((debtor, member, amount))
+        elif amount > 0:
+            rest.append((member, amount))
+    rest.extend(p for group in unmatched_debtors.values() for p in group)
+    rest.sort(key=lambda p: _sort_key(p[0]))
+
+    if len(rest) > max_members:
+        raise BudgetExceeded
+
+    for subset in _zero_sum_subsets(rest, deadline):
+        transfers.extend(_greedy(subset))
+    return transfers
+
+
+def greedy_plan(balances, **options):
+    return _to_decimal(_greedy(_net_positions(balances)))
+
+
+def exact_plan(balances, max_members=None, time_budget=None):
+    config = settings.SETTLEMENT_PLANNER
+    if max_members is None:
+        max_members = config['EXACT_MAX_MEMBERS']
+    if time_budget is None:
+        time_budget = config['EXACT_TIME_BUDGET']
+
+    positions = _net_positions(balances)
+    try:
+        transfers = _exact(positions, max_members, time_budget)
+    except BudgetExceeded:
+        transfers = _greedy(positions)
+    return _to_decimal(transfers)
+
+
+def _to_decimal(transfers):
+    return [(debtor, creditor, from_minor(amount)) for debtor, creditor, amount in transfers]
+
+
+PLANNERS = {
+    'greedy': greedy_plan,
+    'exact': exact_plan,
+}
+
+
+def plan_settlements(balances, strategy=None, **options):
+    """
+    Returns [(debtor, creditor, amount)] for `balances` using the given
+    strategy, or settings.SETTLEMENT_PLANNER['STRATEGY'] by default.
+    """
+
+    strategy = strategy or settings.SETTLEMENT_PLANNER['STRATEGY']
+    return PLANNERS[strategy](balances, **options)
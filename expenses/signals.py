@@ -0,0 +1,132 @@
+import contextvars
+from collections import defaultdict
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_group
+from .checkpoints import invalidate_checkpoints
+from .models import DeletedRow, Expense, Group, Settlement, Split
+from .money import to_minor
+from .utils import apply_balance_deltas, reserve_seqs, row_deltas, unapply_balance_deltas
+
+# Expenses whose delete is in progress. Their splits go in the same
+# cascade, and the expense's own handlers take the splits out of the
+# ledger and invalidate the group once, so the split handlers skip them.
+_deleting_expenses = contextvars.ContextVar('deleting_expenses', default=frozenset())
+# Groups whose delete is in progress; their rows need no tombstones.
+_deleting_groups = contextvars.ContextVar('deleting_groups', default=frozenset())
+
+
+@receiver([post_save, post_delete], sender=Expense)
+@receiver([post_save, post_delete], sender=Settlement)
+def invalidate_on_group_write(sender, instance, **kwargs):
+    invalidate_group(instance.group_id)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    _deleting_groups.set(_deleting_groups.get() | {instance.pk})
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    _deleting_groups.set(_deleting_groups.get() - {instance.pk})
+
+
+# New rows are dated now, after every checkpoint, and already carry a
+# seq of their own. Edits and deletes (admin, cascades) can change
+# history that a checkpoint covers, and have to reach the change feed:
+# an edited row takes a new seq (see remember_ledger_contribution) and a
+# deleted one leaves a DeletedRow. Either way change_seq moves on, so
+# everything cached under the old one is rebuilt.
+def history_changed(group_id, created_at):
+    invalidate_checkpoints(group_id, created_at)
+
+
+def record_deletion(group_id, instance):
+    if group_id in _deleting_groups.get():
+        return
+    DeletedRow.objects.create(
+        group_id=group_id,
+        kind=instance._meta.model_name,
+        row_id=instance.pk,
+        seq=next(reserve_seqs(Group(pk=group_id), 1)),
+    )
+
+
+# The record_* helpers keep the MemberBalance ledger in step with the
+# rows they create (rows added in the admin are handled in
+# expenses.admin). Edits and deletes made anywhere else are applied
+# here, as the difference between the row's old and new contribution.
+@receiver(pre_save, sender=Expense)
+@receiver(pre_save, sender=Split)
+@receiver(pre_save, sender=Settlement)
+def remember_ledger_contribution(sender, instance, **kwargs):
+    if not instance._state.adding:
+        rows = sender.objects.select_related('expense') if sender is Split else sender.objects
+        old = rows.filter(pk=instance.pk).first()
+        instance._ledger_before = row_deltas(old) if old is not None else None
+        if old is not None:
+            instance.seq = next(reserve_seqs(Group(pk=instance.group_id), 1))
+
+
+def ledger_changed(instance):
+    deltas = defaultdict(lambda: defaultdict(int))
+    before = getattr(instance, '_ledger_before', None)
+    if before is not None:
+        for user_id, amount in before[1].items():
+            deltas[before[0]][user_id] -= amount
+    group_id, after = row_deltas(instance)
+    for user_id, amount in after.items():
+        deltas[group_id][user_id] += amount
+    for group_id, changes in deltas.items():
+        apply_balance_deltas(Group(pk=group_id), changes)
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Settlement)
+def history_changed_on_edit(sender, instance, created, **kwargs):
+    if not created:
+        history_changed(instance.group_id, instance.created_at)
+        ledger_changed(instance)
+
+
+@receiver(pre_delete, sender=Expense)
+def remember_split_contributions(sender, instance, **kwargs):
+    splits = defaultdict(int)
+    for user_id, amount in Split.objects.filter(expense_id=instance.pk).values_list('user_id', 'amount'):
+        splits[user_id] -= to_minor(amount)
+    instance._split_deltas = splits
+    _deleting_expenses.set(_deleting_expenses.get() | {instance.pk})
+
+
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=Settlement)
+def history_changed_on_delete(sender, instance, **kwargs):
+    history_changed(instance.group_id, instance.created_at)
+    record_deletion(instance.group_id, instance)
+    group_id, deltas = row_deltas(instance)
+    if sender is Expense:
+        # plus the splits that went with it, gathered before the cascade
+        _deleting_expenses.set(_deleting_expenses.get() - {instance.pk})
+        for user_id, amount in instance._split_deltas.items():
+            deltas[user_id] = deltas.get(user_id, 0) + amount
+    unapply_balance_deltas(group_id, deltas)
+
+
+@receiver([post_save, post_delete], sender=Split)
+def history_changed_on_split_write(sender, instance, **kwargs):
+    if instance.expense_id in _deleting_expenses.get():
+        return
+    # one lookup, cached on the instance for row_deltas below
+    expense = instance.expense
+    invalidate_group(expense.group_id)
+    if kwargs.get('created'):
+        return
+    history_changed(expense.group_id, expense.created_at)
+    if kwargs['signal'] is post_delete:
+        record_deletion(expense.group_id, instance)
+        unapply_balance_deltas(*row_deltas(instance))
+    else:
+        ledger_changed(instance)
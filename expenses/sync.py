@@ -0,0 +1,108 @@
+"""
+Change feed for clients that keep a local copy of their groups.
+
+Every Expense, Split, Settlement and Activity row carries a `seq` from its
+group's monotonic counter (Group.change_seq, see utils.reserve_seqs). A
+cursor records, per group, the last seq the client has seen; a poll
+returns the rows after it, up to the group's committed change_seq, so
+rows committed later can never be skipped.
+
+Rows edited after they were written (in the admin) take a new seq, so
+they come round again with their new values; deleted ones (admin
+deletes, cascades) are listed under `deleted` as DeletedRow tombstones.
+A client applies both by id. Archiving (expenses.archive) moves settled
+history out without tombstones: it changes no balance, and clients may
+keep or drop their copies of rows older than the archive's end.
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+from .models import Activity, DeletedRow, Expense, Settlement, Split
+
+MAX_SEQS_PER_POLL = 1000
+
+
+def encode_cursor(positions):
+    raw = json.dumps({str(g): s for g, s in sorted(positions.items())}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """{group_id: seq} from a cursor; an empty or garbled one starts from scratch."""
+
+    if not cursor:
+        return {}
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return {int(g): int(s) for g, s in json.loads(raw).items()}
+    except (ValueError, TypeError, AttributeError):
+        return {}
+
+
+def _window(groups, positions):
+    """{group_id: (after, upto)} for groups with something new to send."""
+
+    windows = {}
+    for group_id, change_seq in groups:
+        after = positions.get(group_id, 0)
+        upto = min(change_seq, after + MAX_SEQS_PER_POLL)
+        if upto > after:
+            windows[group_id] = (after, upto)
+    return windows
+
+
+def _filter(windows, group_field):
+    q = Q()
+    for group_id, (after, upto) in windows.items():
+        q |= Q(**{group_field: group_id, 'seq__gt': after, 'seq__lte': upto})
+    return q
+
+
+def _rows(queryset, *fields):
+    return [
+        {k: (str(v) if k == 'amount' else v.isoformat() if k == 'created_at' else v) for k, v in row.items()}
+        for row in queryset.order_by('seq').values(*fields)
+    ]
+
+
+def changes_since(groups, cursor):
+    """
+    Rows written or deleted after `cursor` in `groups`, an iterable of
+    (group_id, change_seq) pairs as committed when the poll started.
+    """
+
+    groups = list(groups)
+    positions = decode_cursor(cursor)
+    windows = _window(groups, positions)
+
+    feed = {'expenses': [], 'splits': [], 'settlements': [], 'activities': [], 'deleted': []}
+    if windows:
+        feed['expenses'] = _rows(
+            Expense.objects.filter(_filter(windows, 'group_id')),
+            'id', 'group_id', 'description', 'amount', 'paid_by_id', 'paid_by__username', 'created_at', 'seq',
+        )
+        feed['splits'] = _rows(
+            Split.objects.filter(_filter(windows, 'group_id')),
+            'id', 'expense_id', 'group_id', 'user_id', 'user__username', 'amount', 'seq',
+        )
+        feed['settlements'] = _rows(
+            Settlement.objects.filter(_filter(windows, 'group_id')),
+            'id', 'group_id', 'paid_by_id', 'paid_by__username', 'paid_to_id', 'paid_to__username',
+            'amount', 'created_at', 'seq',
+        )
+        feed['activities'] = _rows(
+            Activity.objects.filter(_filter(windows, 'group_id')),
+            'id', 'group_id', 'user_id', 'message', 'created_at', 'seq',
+        )
+        feed['deleted'] = _rows(
+            DeletedRow.objects.filter(_filter(windows, 'group_id')),
+            'kind', 'row_id', 'group_id', 'seq',
+        )
+
+    new_positions = {group_id: positions.get(group_id, 0) for group_id, _ in groups}
+    new_positions.update({group_id: upto for group_id, (_, upto) in windows.items()})
+    feed['cursor'] = encode_cursor(new_positions)
+    feed['has_more'] = any(new_positions[g] < change_seq for g, change_seq in groups)
+    return feed
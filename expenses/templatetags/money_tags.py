@@ -0,0 +1,7 @@
+from django import template
+
+register = template.Library()
+
+@register.filter
+def absolute(amount):
+    return abs(amount)
@@ -1,3 +1,1135 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .archive import ArchiveError, archive_period
+from .cache import cache_stats, get_group_summary, group_version
+from .checkpoints import ArchivedAsOf, balances_as_of, build_checkpoints, end_of_day
+from .models import Activity, DeletedRow, Expense, Group, MemberBalance, Settlement, Split
+from .money import AllocationError, allocate, split_amount
+from .pagination import keyset_page
+from .reports import request_report
+from .routers import ReplicaRouter, read_replica
+from .network import pairwise_positions, plan_network
+from .settlement import exact_plan, greedy_plan
+from .utils import aggregate_totals, calculate_balances, record_expense, record_settlement, record_settlement_plan, simplify_debts
+
+
+class GroupTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+        self.carol = User.objects.create(username='carol')
+        self.group = Group.objects.create(name='Trip', created_by=self.alice)
+        self.group.members.add(self.alice, self.bob, self.carol)
+        self.client.force_login(self.alice)
+
+    def add_expense(self, amount, split_type='equal', **shares):
+        data = {'description': 'Dinner', 'amount': amount, 'split_type': split_type}
+        for username, share in shares.items():
+            data[f'share_{User.objects.get(username=username).id}'] = share
+        return self.client.post(reverse('add_expense', args=[self.group.id]), data)
+
+    def balances(self, engine='ledger'):
+        return {
+            user.username: amount
+            for user, amount in calculate_balances(self.group, engine=engine).items()
+        }
+
+
+class BalanceLedgerTests(GroupTestCase):
+    def test_add_expense_updates_ledger(self):
+        self.add_expense('90.00')
+        self.assertEqual(self.balances(), {
+            'alice': Decimal('60.00'), 'bob': Decimal('-30.00'), 'carol': Decimal('-30.00'),
+        })
+
+    def test_quick_settle_updates_ledger(self):
+        self.add_expense('90.00')
+        self.client.post(reverse('quick_settle', args=[self.group.id]), {
+            'paid_by': self.bob.id, 'paid_to': self.alice.id, 'amount': '30.00',
+        })
+        self.assertEqual(self.balances()['bob'], Decimal('0.00'))
+        self.assertEqual(self.balances()['alice'], Decimal('30.00'))
+
+    def test_ledger_matches_other_engines(self):
+        self.add_expense('100.00', split_type='unequal', alice='10', bob='50', carol='40')
+        self.add_expense('10.00')
+        self.client.post(reverse('quick_settle', args=[self.group.id]), {
+            'paid_by': self.bob.id, 'paid_to': self.alice.id, 'amount': '20.00',
+        })
+        for engine in ('aggregate', 'python'):
+            with self.subTest(engine=engine):
+                self.assertEqual(self.balances(), self.balances(engine))
+
+    def test_edits_and_deletes_outside_record_helpers_keep_the_ledger(self):
+        self.add_expense('90.00')
+        self.add_expense('60.00', split_type='unequal', alice='10', bob='20', carol='30')
+        self.client.post(reverse('quick_settle', args=[self.group.id]), {
+            'paid_by': self.bob.id, 'paid_to': self.alice.id, 'amount': '20.00',
+        })
+
+        split = Split.objects.filter(user=self.carol).order_by('id').first()
+        split.amount = Decimal('25.00')
+        split.user = self.bob
+        split.save()
+        self.assertEqual(self.balances(), self.balances('aggregate'))
+
+        settlement = Settlement.objects.get()
+        settlement.amount = Decimal('5.00')
+        settlement.save()
+        self.assertEqual(self.balances(), self.balances('aggregate'))
+
+        Expense.objects.filter(description='Dinner').first().delete()
+        self.assertEqual(self.balances(), self.balances('aggregate'))
+
+        # cascades: deleting a user takes their expenses and splits along
+        self.carol.delete()
+        self.assertEqual(self.balances(), self.balances('aggregate'))
+        self.group.delete()
+        self.assertFalse(MemberBalance.objects.exists())
+
+    def test_expense_delete_cost_does_not_grow_with_its_splits(self):
+        solo = record_expense(self.group, self.alice, 'Taxi', Decimal('10.00'), [(self.bob.id, Decimal('10.00'))])
+        shared = record_expense(self.group, self.alice, 'Hotel', Decimal('90.00'),
+                                [(u.id, Decimal('30.00')) for u in (self.alice, self.bob, self.carol)])
+
+        with CaptureQueriesContext(connection) as one_split:
+            solo.delete()
+        with CaptureQueriesContext(connection) as three_splits:
+            shared.delete()
+        # only carol's extra balance UPDATE, no per-split lookups or bumps
+        self.assertEqual(len(three_splits), len(one_split) + 1)
+        self.assertFalse(any(self.balances().values()))
+
+    def test_aggregate_engine_query_count(self):
+        for _ in range(5):
+            self.add_expense('30.00')
+        # four grouped SUMs plus one query to hydrate the members
+        with self.assertNumQueries(5):
+            calculate_balances(self.group, engine='aggregate')
+
+    def test_rebuild_and_verify_command(self):
+        self.add_expense('90.00')
+        MemberBalance.objects.filter(user=self.bob).update(amount=0)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_balances', '--verify', stdout=StringIO())
+
+        call_command('rebuild_balances', stdout=StringIO())
+        call_command('rebuild_balances', '--verify', stdout=StringIO())
+        self.assertEqual(self.balances()['bob'], Decimal('-30.00'))
+
+
+class ReconcileTests(GroupTestCase):
+    def test_matches_other_engines_and_finds_drift(self):
+        from .reconcile import reconcile
+
+        other = Group.objects.create(name='Flat', created_by=self.alice)
+        other.members.add(self.alice, self.bob)
+        self.add_expense('100.00', split_type='unequal', alice='10', bob='50.01', carol='39.99')
+        record_expense(other, self.bob, 'Rent', Decimal('10.00'), [(self.alice.id, Decimal('10.00'))])
+        record_settlement(self.group, self.carol.id, self.alice.id, '0.29', self.carol)
+        self.assertEqual(reconcile(), ({}, 8))
+
+        MemberBalance.objects.filter(group=other, user=self.alice).update(amount=0)
+        MemberBalance.objects.filter(group=self.group, user=self.carol).delete()
+        self.assertEqual(reconcile()[0], {
+            other.id: {self.alice.id: (Decimal('0.00'), Decimal('-10.00'))},
+            self.group.id: {self.carol.id: (Decimal('0.00'), Decimal('-39.70'))},
+        })
+        self.assertEqual(list(reconcile([other.id])[0]), [other.id])
+
+        with self.assertRaises(CommandError):
+            call_command('reconcile_balances', stdout=StringIO())
+        call_command('reconcile_balances', '--fix', stdout=StringIO())
+        call_command('reconcile_balances', stdout=StringIO())
+
+
+class MoneyTests(SimpleTestCase):
+    def test_largest_remainder_reconciles(self):
+        self.assertEqual(allocate(10000, [1, 1, 1]), [3334, 3333, 3333])
+        self.assertEqual(allocate(100, [1, 2]), [33, 67])
+        self.assertEqual(sum(allocate(99999, [3, 7, 11, 13])), 99999)
+
+    def test_split_types(self):
+        self.assertEqual(
+            split_amount(Decimal('10'), 'percentage', ['33.3', '33.3', '33.4']),
+            [Decimal('3.33'), Decimal('3.33'), Decimal('3.34')],
+        )
+        self.assertEqual(
+            split_amount(Decimal('10'), 'unequal', ['2.50', '7.50']),
+            [Decimal('2.50'), Decimal('7.50')],
+        )
+        self.assertEqual(
+            split_amount(Decimal('1'), 'shares', ['1', '2']),
+            [Decimal('0.33'), Decimal('0.67')],
+        )
+
+    def test_invalid_splits(self):
+        with self.assertRaises(AllocationError):
+            split_amount(Decimal('10'), 'unequal', ['2.50', '7.49'])
+        with self.assertRaises(AllocationError):
+            split_amount(Decimal('10'), 'percentage', ['50', '40'])
+        with self.assertRaises(AllocationError):
+            split_amount(Decimal('10'), 'shares', ['0', '0'])
+        with self.assertRaises(AllocationError):
+            split_amount(Decimal('10'), 'unequal', ['abc', '10'])
+
+    def test_non_finite_and_huge_inputs_are_rejected(self):
+        for split_type in ('percentage', 'shares', 'unequal'):
+            for value in ('snan', 'nan', 'inf', '1e999999999', '1e-999999999'):
+                with self.subTest(split_type=split_type, value=value):
+                    with self.assertRaises(AllocationError):
+                        split_amount(Decimal('10'), split_type, [value, '50'])
+        with self.assertRaises(AllocationError):
+            split_amount('1e999999999', 'equal', ['0', '0'])
+
+
+
+class ExactSplitTests(GroupTestCase):
+    def test_equal_split_has_no_dust(self):
+        for _ in range(3):
+            self.add_expense('100.00')
+        self.assertEqual(sum(self.balances().values()), 0)
+        self.assertEqual(len(simplify_debts(calculate_balances(self.group))), 2)
+
+    def test_percentage_split(self):
+        self.add_expense('200.00', split_type='percentage', alice='50', bob='25', carol='25')
+        self.assertEqual(
+            sorted(Split.objects.values_list('amount', flat=True)),
+            [Decimal('50.00'), Decimal('50.00'), Decimal('100.00')],
+        )
+
+    def test_invalid_unequal_split_writes_nothing(self):
+        response = self.add_expense('100.00', split_type='unequal', alice='10', bob='10', carol='10')
+        self.assertContains(response, 'must equal expense amount')
+        self.assertFalse(self.group.expenses.exists())
+
+    def test_non_finite_shares_are_a_form_error(self):
+        for share in ('snan', '1e999999999'):
+            with self.subTest(share=share):
+                response = self.add_expense('100.00', split_type='percentage', alice=share, bob='50', carol='50')
+                self.assertContains(response, 'Percentages must be numbers.')
+        self.assertFalse(self.group.expenses.exists())
+
+
+class RecordExpenseTests(GroupTestCase):
+    def test_bulk_write_query_count_is_flat(self):
+        users = User.objects.bulk_create([User(username=f'member{i}') for i in range(50)])
+        shares = [(u.id, Decimal('2.00')) for u in users]
+
+        # savepoint, 2 seq reservation queries, expense, one bulk split
+        # insert, 3 ledger queries, activity, release savepoint --
+        # regardless of member count
+        with self.assertNumQueries(10):
+            expense = record_expense(self.group, self.alice, 'Hotel', Decimal('100.00'), shares)
+        self.assertEqual(expense.splits.count(), 50)
+        self.assertEqual(self.group.activities.count(), 1)
+
+    def test_failed_write_leaves_nothing_behind(self):
+        shares = [(self.alice.id, Decimal('5.00')), (self.bob.id, Decimal('5.00'))]
+        with mock.patch('expenses.utils.Activity.objects.create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                record_expense(self.group, self.alice, 'Bad', Decimal('10.00'), shares)
+        self.assertFalse(self.group.expenses.exists())
+        self.assertFalse(self.group.member_balances.exists())
+
+
+class MemberPickerTests(GroupTestCase):
+    def test_prefix_search_is_limited_and_skips_members(self):
+        User.objects.bulk_create([User(username=f'Dave{i:02}') for i in range(15)])
+        User.objects.create(username='alicia')
+
+        results = self.client.get(reverse('search_users'), {'q': 'dav'}).json()['results']
+        self.assertEqual(len(results), 10)
+        self.assertEqual(results[0]['username'], 'Dave00')
+
+        results = self.client.get(reverse('search_users'), {'q': 'ali', 'group': self.group.id}).json()['results']
+        self.assertEqual([r['username'] for r in results], ['alicia'])
+        self.assertEqual(self.client.get(reverse('search_users'), {'q': 'a'}).json()['results'], [])
+
+    def test_create_group_takes_ids_without_listing_users(self):
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(50)])
+        page = self.client.get(reverse('create_group'))
+        self.assertNotContains(page, 'user49')
+
+        response = self.client.post(reverse('create_group'), {'name': 'Flat', 'members': [self.bob.id]})
+        group = Group.objects.get(name='Flat')
+        self.assertRedirects(response, reverse('group_detail', args=[group.id]))
+        self.assertEqual(set(group.members.all()), {self.alice, self.bob})
+
+        response = self.client.post(reverse('create_group'), {'name': 'Bad', 'members': ['999999']})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Group.objects.filter(name='Bad').exists())
+
+    def test_add_members_to_existing_group(self):
+        dave = User.objects.create(username='dave')
+        self.group.refresh_from_db()
+        seq = self.group.change_seq
+        self.client.post(reverse('add_group_members', args=[self.group.id]), {'members': [dave.id, self.bob.id]})
+
+        self.assertIn(dave, self.group.members.all())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.change_seq, seq + 1)
+        self.assertEqual(self.group.activities.get().message, 'alice added dave to the group')
+
+        response = self.client.get(reverse('group_detail', args=[self.group.id]))
+        self.assertContains(response, 'Group Members (4)')
+
+    def test_invalid_members_are_reported(self):
+        url = reverse('add_group_members', args=[self.group.id])
+        response = self.client.post(url, {'members': ['999999']}, follow=True)
+        self.assertContains(response, 'Select a valid choice.')
+        response = self.client.post(url, {}, follow=True)
+        self.assertContains(response, 'This field is required.')
+        self.assertEqual(self.group.members.count(), 3)
+
+
+class QuickSettleTests(GroupTestCase):
+    def settle(self, paid_by, paid_to, amount, token=''):
+        return self.client.post(reverse('quick_settle', args=[self.group.id]), {
+            'paid_by': paid_by.id, 'paid_to': paid_to.id, 'amount': amount, 'client_token': token,
+        })
+
+    def test_amount_is_capped_by_both_sides(self):
+        self.add_expense('90.00')
+        self.settle(self.bob, self.carol, '10.00')  # carol is owed nothing
+        response = self.settle(self.bob, self.alice, '30.01')  # bob only owes 30
+        self.assertContains(self.client.get(response.url), 'At most ₹30.00 can be settled.')
+        self.assertFalse(self.group.settlements.exists())
+
+        self.settle(self.bob, self.alice, '30.00')
+        self.assertEqual(self.balances()['bob'], Decimal('0.00'))
+
+    def test_client_token_makes_it_idempotent(self):
+        self.add_expense('90.00')
+        self.settle(self.bob, self.alice, '10.00', token='abc-1')
+        self.settle(self.bob, self.alice, '10.00', token='abc-1')
+        self.assertEqual(self.group.settlements.count(), 1)
+        self.assertEqual(self.balances()['bob'], Decimal('-20.00'))
+
+        # a token only matches settlements in its own group
+        other = Group.objects.create(name='Flat', created_by=self.alice)
+        other.members.add(self.alice, self.bob)
+        record_expense(other, self.alice, 'Rent', Decimal('10.00'), [(self.bob.id, Decimal('10.00'))])
+        settlement, created = record_settlement(other, self.bob.id, self.alice.id, '10.00', self.bob, client_token='abc-1')
+        self.assertTrue(created)
+        self.assertEqual(settlement.group, other)
+
+    def test_query_count_does_not_grow_with_history(self):
+        for _ in range(20):
+            self.add_expense('30.00')
+        # token check, savepoint, seq reservation (2), locked balance rows,
+        # settlement, ledger update, activity, release
+        with self.assertNumQueries(9):
+            record_settlement(self.group, self.bob.id, self.alice.id, '5.00', self.bob, client_token='t')
+
+
+class SettlePlanTests(GroupTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_expense('90.00')
+        self.url = reverse('settle_plan', args=[self.group.id])
+
+    def plan_seq(self):
+        self.group.refresh_from_db()
+        return self.group.change_seq
+
+    def test_settle_all_in_constant_queries(self):
+        plan_seq = self.plan_seq()
+        # savepoint, seq reservation (2), locked balance rows, two bulk
+        # inserts, ledger update, release
+        with self.assertNumQueries(8):
+            record_settlement_plan(self.group, [
+                (self.bob.id, self.alice.id, '30.00'),
+                (self.carol.id, self.alice.id, '30.00'),
+            ], self.alice, plan_seq)
+        self.assertEqual(set(self.balances().values()), {Decimal('0.00')})
+        self.assertEqual(self.balances(), self.balances('aggregate'))
+        self.assertEqual(get_group_summary(self.group)['transactions'], [])
+
+    def test_settle_selected(self):
+        self.client.post(self.url, {
+            'plan_seq': self.plan_seq(), 'transfer': [f'{self.bob.id}:{self.alice.id}:30.00'],
+        })
+        self.assertEqual(self.balances()['bob'], Decimal('0.00'))
+        self.assertEqual(self.balances()['carol'], Decimal('-30.00'))
+
+    def test_stale_plan_is_rejected(self):
+        plan_seq = self.plan_seq()
+        self.add_expense('30.00')
+        response = self.client.post(self.url, {'plan_seq': plan_seq, 'all': '1'}, follow=True)
+        self.assertContains(response, 'The balances changed, please review the new plan.')
+        self.assertFalse(self.group.settlements.exists())
+
+        self.client.post(self.url, {'plan_seq': self.plan_seq(), 'all': '1'})
+        self.assertEqual(self.group.settlements.count(), 2)
+        self.assertEqual(set(self.balances().values()), {Decimal('0.00')})
+
+
+class SettlementPlannerTests(SimpleTestCase):
+    def settles(self, balances, plan):
+        remaining = dict(balances)
+        for debtor, creditor, amount in plan:
+            self.assertGreater(amount, 0)
+            remaining[debtor] += amount
+            remaining[creditor] -= amount
+        self.assertTrue(all(amount == 0 for amount in remaining.values()))
+
+    def test_greedy_is_deterministic_and_settles(self):
+        balances = {3: Decimal('-30'), 1: Decimal('50'), 2: Decimal('-20')}
+        plan = greedy_plan(balances)
+        self.settles(balances, plan)
+        self.assertEqual(plan, greedy_plan(dict(reversed(list(balances.items())))))
+        self.assertEqual(plan[0], (3, 1, Decimal('30.00')))
+
+    def test_exact_finds_fewer_transfers(self):
+        # two independent zero-sum clusters: {1, 2, 3} and {4, 5, 6}
+        balances = {
+            1: Decimal('7'), 2: Decimal('-4'), 3: Decimal('-3'),
+            4: Decimal('6'), 5: Decimal('-5'), 6: Decimal('-1'),
+        }
+        exact = exact_plan(balances, max_members=14, time_budget=1)
+        self.settles(balances, exact)
+        self.assertEqual(len(exact), 4)
+        self.assertGreater(len(greedy_plan(balances)), len(exact))
+
+    def test_exact_falls_back_to_greedy_over_budget(self):
+        balances = {i: Decimal(i % 7 + 1) for i in range(1, 31)}
+        balances[0] = -sum(balances.values())
+        self.assertEqual(
+            exact_plan(balances, max_members=10, time_budget=1),
+            greedy_plan(balances),
+        )
+
+
+class GroupCacheTests(GroupTestCase):
+    def test_repeat_views_hit_the_cache(self):
+        self.add_expense('90.00')
+        self.client.get(reverse('group_detail', args=[self.group.id]))
+        self.client.get(reverse('group_detail', args=[self.group.id]))
+        self.assertEqual(cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_warm_group_page_skips_fragment_queries(self):
+        self.add_expense('90.00')
+        url = reverse('group_detail', args=[self.group.id])
+        cold = self.client.get(url)
+
+        # session, user, group membership check, recent activity
+        with self.assertNumQueries(4):
+            warm = self.client.get(url)
+        self.assertContains(warm, 'Group Members (3)')
+        self.assertContains(warm, 'Splits:')
+        self.assertEqual(warm.content.count(b'csrfmiddlewaretoken'), cold.content.count(b'csrfmiddlewaretoken'))
+
+        self.add_expense('30.00')
+        self.assertContains(self.client.get(url), '₹80.00')
+
+    def test_writes_bump_the_version(self):
+        version = group_version(self.group.id)
+        self.add_expense('90.00')
+        self.assertGreater(group_version(self.group.id), version)
+
+        summary = get_group_summary(self.group)
+        self.client.post(reverse('quick_settle', args=[self.group.id]), {
+            'paid_by': self.bob.id, 'paid_to': self.alice.id, 'amount': '30.00',
+        })
+        fresh = get_group_summary(self.group)
+        self.assertNotEqual(fresh['version'], summary['version'])
+        self.assertEqual(fresh['balances'][self.bob], Decimal('0.00'))
+        self.assertEqual(len(fresh['transactions']), 1)
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}):
+                self.add_expense('90.00')
+                first = get_group_summary(self.group)
+                self.assertEqual(get_group_summary(self.group), first)
+                self.add_expense('30.00')
+                self.assertEqual(get_group_summary(self.group)['balances'][self.alice], Decimal('80.00'))
+                self.assertEqual(cache_stats(), {'hits': 1, 'misses': 2})
+
+
+class CheckpointTests(GroupTestCase):
+    def setUp(self):
+        super().setUp()
+        tz = timezone.get_current_timezone()
+        self.jan = record_expense(self.group, self.alice, 'Hotel', Decimal('90.00'),
+                                  [(u.id, Decimal('30.00')) for u in (self.alice, self.bob, self.carol)])
+        self.mar = record_expense(self.group, self.bob, 'Taxi', Decimal('20.00'),
+                                  [(self.alice.id, Decimal('20.00'))])
+        settlement, _ = record_settlement(self.group, self.carol.id, self.alice.id, '30.00', self.carol)
+        Expense.objects.filter(id=self.jan.id).update(created_at=datetime(2024, 1, 10, 12, tzinfo=tz))
+        Expense.objects.filter(id=self.mar.id).update(created_at=datetime(2024, 3, 5, 12, tzinfo=tz))
+        Settlement.objects.filter(id=settlement.id).update(created_at=datetime(2024, 2, 20, 12, tzinfo=tz))
+        self.until = datetime(2024, 4, 15, tzinfo=tz)
+
+    def as_of(self, day):
+        return {
+            user.username: amount
+            for user, amount in get_group_summary(self.group, as_of=day)['balances'].items()
+        }
+
+    def test_checkpoints_match_replay(self):
+        built = build_checkpoints(self.group, 'month', until=self.until)
+        self.assertEqual([timezone.localdate(c.as_of) for c in built], [date(2024, 2, 1), date(2024, 3, 1), date(2024, 4, 1)])
+        self.assertEqual(build_checkpoints(self.group, 'month', until=self.until), [])
+
+        for day in (date(2024, 1, 31), date(2024, 2, 20), date(2024, 3, 10)):
+            with self.subTest(day=day):
+                before = end_of_day(day)
+                self.assertEqual(balances_as_of(self.group, before),
+                                 aggregate_totals(self.group, before=before))
+        self.assertEqual(self.as_of(date(2024, 2, 25)), {
+            'alice': Decimal('30.00'), 'bob': Decimal('-30.00'), 'carol': Decimal('0.00'),
+        })
+        # nearest checkpoint + four grouped sums over the rows since
+        with self.assertNumQueries(5):
+            balances_as_of(self.group, end_of_day(date(2024, 3, 10)))
+
+    def test_history_edits_drop_later_checkpoints(self):
+        build_checkpoints(self.group, 'month', until=self.until)
+        Expense.objects.get(id=self.mar.id).delete()
+        self.assertEqual(
+            [timezone.localdate(c.as_of) for c in self.group.checkpoints.order_by('as_of')],
+            [date(2024, 2, 1), date(2024, 3, 1)],
+        )
+        call_command('build_checkpoints', self.group.id, stdout=StringIO())
+        self.assertEqual(balances_as_of(self.group, timezone.now()), aggregate_totals(self.group))
+
+    def test_group_page_and_exports_as_of(self):
+        url = reverse('group_detail', args=[self.group.id])
+        response = self.client.get(url, {'as_of': '2024-01-31'})
+        self.assertContains(response, 'as of the end of January 31, 2024')
+        self.assertNotContains(response, 'Settle all')
+        self.assertNotContains(response, '<strong>Taxi</strong>', html=False)
+        self.assertContains(self.client.get(url), 'Settle all')
+
+        response = self.client.get(reverse('export_group_csv', args=[self.group.id]), {'as_of': '2024-01-31'})
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertIn(['Balances as of 2024-01-31'], rows)
+        self.assertIn(['carol', '-30.00'], rows)
+        self.assertNotIn('Taxi', [row[0] for row in rows if row])
+
+
+class ArchiveTests(GroupTestCase):
+    def setUp(self):
+        super().setUp()
+        self.archive_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_root.cleanup)
+        overrides = override_settings(ARCHIVE_ROOT=self.archive_root.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        tz = timezone.get_current_timezone()
+        old = record_expense(self.group, self.alice, 'Hotel', Decimal('90.00'),
+                             [(u.id, Decimal('30.00')) for u in (self.alice, self.bob, self.carol)])
+        self.group.refresh_from_db()
+        record_settlement_plan(self.group, [
+            (self.bob.id, self.alice.id, '30.00'), (self.carol.id, self.alice.id, '30.00'),
+        ], self.alice, self.group.change_seq)
+        Expense.objects.filter(id=old.id).update(created_at=datetime(2024, 1, 10, tzinfo=tz))
+        Settlement.objects.update(created_at=datetime(2024, 2, 10, tzinfo=tz))
+        Activity.objects.update(created_at=datetime(2024, 2, 10, tzinfo=tz))
+        self.add_expense('60.00')
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('archive_settled', '--dry-run', stdout=out)
+        self.assertIn('would archive up to', out.getvalue())
+        self.assertFalse(self.group.checkpoints.exists())
+        self.assertFalse(self.group.archived_periods.exists())
+
+    def test_settled_history_moves_to_the_archive(self):
+        balances = self.balances()
+        call_command('archive_settled', stdout=StringIO())
+
+        period = self.group.archived_periods.get()
+        # the latest month boundary that is both settled and 90+ days old
+        self.assertEqual(timezone.localtime(period.end).day, 1)
+        self.assertLess(period.end, timezone.now() - timedelta(days=90))
+        self.assertGreater(period.end, timezone.now() - timedelta(days=125))
+        self.assertEqual((period.expense_count, period.split_count, period.settlement_count), (1, 3, 2))
+        self.assertEqual(period.total_spent, Decimal('90.00'))
+        self.assertEqual(self.group.expenses.count(), 1)
+        self.assertFalse(self.group.settlements.exists())
+        self.assertEqual(Split.objects.filter(expense__group=self.group).count(), 3)
+
+        for engine in ('ledger', 'aggregate', 'python'):
+            with self.subTest(engine=engine):
+                self.assertEqual(self.balances(engine), balances)
+        call_command('reconcile_balances', stdout=StringIO())
+
+        # nothing new settled, so a second run archives nothing
+        call_command('archive_settled', stdout=StringIO())
+        self.assertEqual(self.group.archived_periods.count(), 1)
+
+        response = self.client.get(reverse('archived_period', args=[self.group.id, period.id]))
+        self.assertContains(response, 'Hotel')
+        self.assertContains(response, 'bob → alice')
+        response = self.client.get(reverse('export_archived_period_csv', args=[self.group.id, period.id]))
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertIn(['Expenses'], rows)
+        self.assertEqual(len(rows[rows.index(['Splits']) + 2:rows.index(['Settlements']) - 1]), 3)
+
+    def test_as_of_inside_the_archive_points_there(self):
+        call_command('archive_settled', stdout=StringIO())
+        period = self.group.archived_periods.get()
+        archived_url = reverse('archived_period', args=[self.group.id, period.id])
+        query = {'as_of': '2024-01-20'}
+
+        for name in ('group_detail', 'export_group_csv', 'export_group_pdf'):
+            with self.subTest(view=name):
+                response = self.client.get(reverse(name, args=[self.group.id]), query)
+                self.assertRedirects(response, archived_url, fetch_redirect_response=False)
+        self.assertContains(self.client.get(archived_url), 'is in archived history')
+
+        response = self.client.get(reverse('api_group_balances', args=[self.group.id]), query)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()['archived_period'], period.id)
+        with self.assertRaises(ArchivedAsOf):
+            balances_as_of(self.group, end_of_day(date(2024, 1, 20)))
+
+        # after the archive's end the live rows still give the right answer
+        response = self.client.get(reverse('group_detail', args=[self.group.id]), {'as_of': date.today().isoformat()})
+        self.assertEqual(response.status_code, 200)
+
+    def test_import_into_archived_history_is_refused(self):
+        call_command('archive_settled', stdout=StringIO())
+        upload = SimpleUploadedFile('late.csv', (
+            "description,amount,paid_by,split_type,splits,date\n"
+            "Ferry,30,bob,,,2024-01-15\n"
+        ).encode())
+        response = self.client.post(reverse('import_group_expenses', args=[self.group.id]), {'file': upload})
+
+        [(line, message)] = response.context['errors']
+        self.assertIn('is in archived history', message)
+        self.assertFalse(self.group.expenses.filter(description='Ferry').exists())
+
+    def test_unsettled_period_is_refused(self):
+        build_checkpoints(self.group)
+        end = self.group.checkpoints.order_by('as_of').first().as_of  # Feb 1: still owed
+        with self.assertRaises(ArchiveError):
+            archive_period(self.group, end)
+        self.assertEqual(self.group.expenses.count(), 2)
+
+
+class CsvExportTests(GroupTestCase):
+    def test_streams_all_sections(self):
+        self.add_expense('90.00')
+        self.add_expense('10.00', split_type='unequal', alice='0', bob='10', carol='0')
+        response = self.client.get(reverse('export_group_csv', args=[self.group.id]))
+
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertIn(['Splits'], rows)
+        split_rows = rows[rows.index(['Splits']) + 2:rows.index(['Settlements']) - 1]
+        self.assertEqual(len(split_rows), 6)
+        self.assertIn(['bob', '-40.00'], rows)
+
+
+class PdfReportTests(GroupTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reports_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.reports_root.cleanup)
+        overrides = override_settings(REPORTS_ROOT=self.reports_root.name, REPORT_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_report_is_reused_until_the_group_changes(self):
+        self.add_expense('90.00')
+        response = self.client.get(reverse('export_group_pdf', args=[self.group.id]))
+        self.assertRedirects(response, reverse('download_group_pdf', args=[self.group.id]))
+
+        status = self.client.get(reverse('group_pdf_status', args=[self.group.id])).json()
+        self.assertEqual(status['status'], 'ready')
+
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+
+        with mock.patch('expenses.pdf.render_group_pdf') as render:
+            self.client.get(reverse('export_group_pdf', args=[self.group.id]))
+        render.assert_not_called()
+
+        # the name comes from the database alone, so every worker agrees on it
+        self.group.refresh_from_db()
+        self.assertEqual(request_report(self.group).name, f'group-{self.group.id}-s{self.group.change_seq}.pdf')
+
+        # a superseded report survives a grace period for in-flight downloads
+        old = request_report(self.group)
+        self.add_expense('30.00')
+        self.client.get(reverse('export_group_pdf', args=[self.group.id]))
+        self.assertEqual(len(list(Path(self.reports_root.name).glob('*.pdf'))), 2)
+
+        os.utime(old, (0, 0))
+        self.add_expense('10.00')
+        self.client.get(reverse('export_group_pdf', args=[self.group.id]))
+        self.assertFalse(old.exists())
+        self.assertEqual(len(list(Path(self.reports_root.name).glob('*.pdf'))), 2)
+
+    def test_admin_edit_changes_the_report_name(self):
+        self.add_expense('90.00')
+        self.group.refresh_from_db()
+        before = request_report(self.group)
+
+        Expense.objects.get().save()
+        self.group.refresh_from_db()
+        self.assertNotEqual(request_report(self.group), before)
+
+    def test_admin_add_changes_the_report_name(self):
+        self.add_expense('90.00')
+        self.group.refresh_from_db()
+        before = request_report(self.group)
+
+        User.objects.filter(pk=self.alice.pk).update(is_staff=True, is_superuser=True)
+        self.client.post(reverse('admin:expenses_expense_add'), {
+            'group': self.group.id, 'description': 'Boat', 'amount': '30.00',
+            'paid_by': self.bob.id, 'seq': 0,
+        })
+        boat = Expense.objects.get(description='Boat')
+        self.group.refresh_from_db()
+        self.assertEqual(boat.seq, self.group.change_seq)
+        self.assertNotEqual(request_report(self.group), before)
+        self.assertEqual(self.balances()['bob'], Decimal('0.00'))
+
+    def test_as_of_report_sits_next_to_the_current_one(self):
+        self.add_expense('90.00')
+        self.client.get(reverse('export_group_pdf', args=[self.group.id]))
+        response = self.client.get(reverse('export_group_pdf', args=[self.group.id]), {'as_of': '2024-01-31'})
+        self.assertRedirects(response, reverse('download_group_pdf', args=[self.group.id]) + '?as_of=2024-01-31')
+        self.assertIn('_2024-01-31.pdf', self.client.get(response.url)['Content-Disposition'])
+        self.assertEqual(len(list(Path(self.reports_root.name).glob('*.pdf'))), 2)
+
+    def test_download_before_ready_is_404(self):
+        response = self.client.get(reverse('download_group_pdf', args=[self.group.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_reportlab_is_not_loaded_at_boot(self):
+        # a fresh interpreter, since this one has rendered reports already
+        script = (
+            "import sys, django; django.setup(); "
+            "from django.urls import get_resolver; get_resolver().url_patterns; "
+            "print('reportlab' in sys.modules)"
+        )
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), 'False')
+
+
+class DashboardTests(GroupTestCase):
+    def make_groups(self, count):
+        for i in range(count):
+            group = Group.objects.create(name=f'Flat {i}', created_by=self.alice)
+            group.members.add(self.alice, self.bob)
+            record_expense(group, self.bob, 'Rent', Decimal('10.00'), [
+                (self.alice.id, Decimal('5.00')), (self.bob.id, Decimal('5.00')),
+            ])
+
+    def test_query_count_does_not_grow_with_groups(self):
+        self.make_groups(2)
+        with self.assertNumQueries(3):
+            self.client.get(reverse('dashboard'))
+        self.make_groups(20)
+        with self.assertNumQueries(3):
+            self.client.get(reverse('dashboard'))
+
+    def test_per_group_and_total_balances(self):
+        self.add_expense('90.00')
+        self.make_groups(2)
+        response = self.client.get(reverse('dashboard'))
+
+        groups = {g.name: g for g in response.context['groups']}
+        self.assertEqual(groups['Trip'].member_count, 3)
+        self.assertEqual(groups['Trip'].my_balance, Decimal('60.00'))
+        self.assertEqual(groups['Flat 0'].my_balance, Decimal('-5.00'))
+        self.assertEqual(response.context['net_total'], Decimal('50.00'))
+        self.assertContains(response, 'You are owed ₹50.00')
+
+
+class NetworkNettingTests(GroupTestCase):
+    def setUp(self):
+        super().setUp()
+        self.flat = Group.objects.create(name='Flat', created_by=self.bob)
+        self.flat.members.add(self.alice, self.bob)
+        self.other = Group.objects.create(name='Elsewhere', created_by=self.carol)
+        self.dave = User.objects.create(username='dave')
+        self.other.members.add(self.carol, self.dave)
+
+    def test_nets_debts_across_groups(self):
+        # alice owes bob 40 in the trip, bob owes alice 25 in the flat
+        record_expense(self.group, self.bob, 'Fuel', Decimal('40.00'), [(self.alice.id, Decimal('40.00'))])
+        record_expense(self.flat, self.alice, 'Rent', Decimal('25.00'), [(self.bob.id, Decimal('25.00'))])
+        # carol owes dave 10 in an unrelated group
+        record_expense(self.other, self.dave, 'Lunch', Decimal('10.00'), [(self.carol.id, Decimal('10.00'))])
+
+        self.assertEqual(pairwise_positions(), {
+            (self.alice.id, self.bob.id): 1500,
+            (self.carol.id, self.dave.id): 1000,
+        })
+        self.assertCountEqual(plan_network(), [
+            (self.alice.id, self.bob.id, Decimal('15.00')),
+            (self.carol.id, self.dave.id, Decimal('10.00')),
+        ])
+
+        response = self.client.get(reverse('network_balances')).json()
+        self.assertEqual(response['transfers'], [{'from': 'alice', 'to': 'bob', 'amount': '15.00'}])
+        self.assertEqual(response['positions'], [{'user': 'bob', 'amount': '15.00'}])
+
+    def test_never_plans_a_transfer_between_strangers(self):
+        # alice owes bob 30 in the flat, bob owes dave 30 elsewhere:
+        # alice and dave share no group, so bob stays in the middle
+        chain = Group.objects.create(name='Chain', created_by=self.bob)
+        chain.members.add(self.bob, self.dave)
+        record_expense(self.flat, self.bob, 'Rent', Decimal('30.00'), [(self.alice.id, Decimal('30.00'))])
+        record_expense(chain, self.dave, 'Gas', Decimal('30.00'), [(self.bob.id, Decimal('30.00'))])
+
+        self.assertCountEqual(plan_network(), [
+            (self.alice.id, self.bob.id, Decimal('30.00')),
+            (self.bob.id, self.dave.id, Decimal('30.00')),
+        ])
+        response = self.client.get(reverse('network_balances')).json()
+        self.assertEqual(response['transfers'], [{'from': 'alice', 'to': 'bob', 'amount': '30.00'}])
+        self.assertNotIn('dave', json.dumps(response))
+
+
+class KeysetPaginationTests(GroupTestCase):
+    def test_walks_every_row_once_even_with_timestamp_ties(self):
+        Activity.objects.bulk_create([
+            Activity(group=self.group, user=self.alice, message=str(i)) for i in range(45)
+        ])
+        # force ties so ordering has to fall back on id
+        tied = Activity.objects.order_by('id').values_list('id', flat=True)[10:30]
+        Activity.objects.filter(id__in=list(tied)).update(created_at=timezone.now())
+
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(self.group.activities.all(), cursor, page_size=10)
+            seen.extend(a.id for a in page.items)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        expected = list(self.group.activities.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_activity_log_pages(self):
+        Activity.objects.bulk_create([
+            Activity(group=self.group, user=self.alice, message=f'event {i}') for i in range(60)
+        ])
+        first = self.client.get(reverse('activity_log', args=[self.group.id]))
+        self.assertEqual(len(first.context['activities']), 50)
+        second = self.client.get(
+            reverse('activity_log', args=[self.group.id]),
+            {'cursor': first.context['page'].next_cursor},
+        )
+        self.assertEqual(len(second.context['activities']), 10)
+        self.assertFalse(second.context['page'].has_next)
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('activity_log', args=[self.group.id]), {'cursor': '%%%'})
+        self.assertEqual(response.status_code, 200)
+
+
+class ExpenseImportTests(GroupTestCase):
+    CSV = (
+        "description,amount,paid_by,split_type,splits,date\n"
+        "Hotel,300,alice,,,2024-01-05\n"
+        "Taxi,50,bob,equal,alice;bob,\n"
+        "Museum,100,carol,percentage,alice:20;bob:30;carol:50,\n"
+    )
+
+    def test_csv_upload(self):
+        upload = SimpleUploadedFile('trip.csv', self.CSV.encode())
+        response = self.client.post(reverse('import_group_expenses', args=[self.group.id]), {'file': upload})
+
+        # redirected, so refreshing the page can't import the file twice
+        self.assertRedirects(response, reverse('group_detail', args=[self.group.id]), fetch_redirect_response=False)
+        self.assertContains(self.client.get(response.url), 'Imported 3 expenses')
+        self.assertEqual(self.group.expenses.count(), 3)
+        self.assertEqual(Split.objects.filter(expense__group=self.group).count(), 8)
+        self.assertEqual(self.group.activities.count(), 3)
+        self.assertEqual(self.group.expenses.get(description='Hotel').created_at.year, 2024)
+        self.assertEqual(self.balances(), self.balances('aggregate'))
+        self.assertEqual(self.balances()['carol'], Decimal('-50.00'))
+
+    def test_any_bad_row_rejects_the_whole_file(self):
+        csv_data = self.CSV + "Boat,abc,alice,,,\nBus,10,mallory,,,\n"
+        upload = SimpleUploadedFile('trip.csv', csv_data.encode())
+        response = self.client.post(reverse('import_group_expenses', args=[self.group.id]), {'file': upload})
+
+        self.assertEqual([line for line, _ in response.context['errors']], [5, 6])
+        self.assertFalse(self.group.expenses.exists())
+
+    def test_malformed_input_is_a_row_error(self):
+        upload = SimpleUploadedFile('trip.csv', self.CSV.encode() + b'Huge,"' + b'x' * 200_000 + b'",alice,,,\n')
+        response = self.client.post(reverse('import_group_expenses', args=[self.group.id]), {'file': upload})
+        self.assertIn('Malformed CSV', response.context['errors'][0][1])
+
+        line = json.dumps({'description': 'Dinner', 'amount': '90', 'paid_by': 'alice', 'splits': 3})
+        upload = SimpleUploadedFile('trip.ndjson', line.encode())
+        response = self.client.post(reverse('import_group_expenses', args=[self.group.id]), {'file': upload})
+        self.assertEqual(response.context['errors'], [(1, "Splits must be text, a list or an object.")])
+        self.assertFalse(self.group.expenses.exists())
+
+    def test_amounts_beyond_the_column_are_a_row_error(self):
+        csv_data = self.CSV + "Yacht,123456789.50,alice,,,\n"
+        upload = SimpleUploadedFile('trip.csv', csv_data.encode())
+        response = self.client.post(reverse('import_group_expenses', args=[self.group.id]), {'file': upload})
+
+        [(line, message)] = response.context['errors']
+        self.assertEqual(line, 5)
+        self.assertIn('Amount 123456789.50', message)
+        self.assertFalse(self.group.expenses.exists())
+
+    def test_ndjson_command(self):
+        lines = [
+            {'description': 'Dinner', 'amount': '90', 'paid_by': 'alice'},
+            {'description': 'Drinks', 'amount': '30', 'paid_by': 'bob', 'split_type': 'shares',
+             'splits': {'bob': 1, 'carol': 2}},
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as f:
+            f.write('\n'.join(json.dumps(line) for line in lines))
+        self.addCleanup(os.unlink, f.name)
+
+        out = StringIO()
+        with self.assertNumQueries(14):
+            call_command('import_expenses', self.group.id, f.name, stdout=out)
+        self.assertIn('Imported 2 expenses', out.getvalue())
+        self.assertEqual(self.balances()['carol'], Decimal('-50.00'))
+
+
+class BenchmarkCommandTests(GroupTestCase):
+    def test_seed_then_bench(self):
+        call_command('seed_benchmark', '--users', 6, '--groups', 2, '--members', 4,
+                     '--expenses', 30, '--settlements', 3, stdout=StringIO())
+        call_command('rebuild_balances', '--verify', stdout=StringIO())
+        group = Group.objects.get(name='bench_group_0')
+        self.assertEqual(group.expenses.count(), 30)
+        self.assertEqual(group.settlements.count(), 3)
+
+        cache.set('unrelated', 1)
+        out = StringIO()
+        call_command('bench', '--group', group.id, '--repeat', 2,
+                     '--only', 'calculate_balances[ledger]', 'group_detail[cold]',
+                     stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['group']['expenses'], 30)
+        self.assertEqual(set(report['results']), {'calculate_balances[ledger]', 'group_detail[cold]'})
+        # the cold runs only invalidate the benchmarked group
+        self.assertEqual(cache.get('unrelated'), 1)
+        self.assertEqual(report['results']['calculate_balances[ledger]']['queries'], 2)
+
+
+@override_settings(REQUEST_TIMING={'ENABLED': True, 'SLOW_MS': 0, 'TOP_SQL': 3})
+class RequestTimingTests(GroupTestCase):
+    def test_server_timing_header_and_slow_log(self):
+        record_expense(self.group, self.alice, 'Dinner', Decimal('90.00'),
+                       [(u.id, Decimal('30.00')) for u in (self.alice, self.bob, self.carol)])
+        with self.assertLogs('expenses.timing', 'WARNING') as logs:
+            response = self.client.get(reverse('group_detail', args=[self.group.id]))
+
+        metrics = dict(part.strip().split(';', 1) for part in response['Server-Timing'].split(','))
+        self.assertEqual(set(metrics), {'db', 'view', 'render', 'total'})
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['path'], reverse('group_detail', args=[self.group.id]))
+        self.assertIn(f'desc="{line["queries"]} queries"', metrics['db'])
+        self.assertGreater(line['queries'], 0)
+        self.assertLessEqual(len(line['slowest_sql']), 3)
+
+    @override_settings(REQUEST_TIMING={'ENABLED': False})
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('group_detail', args=[self.group.id]))
+        self.assertNotIn('Server-Timing', response)
+
+
+# 'default' stands in for the replica alias: the test database has no other
+@override_settings(DATABASE_REPLICAS=['default'], DATABASE_ROUTERS=['expenses.routers.ReplicaRouter'])
+class ReplicaRoutingTests(GroupTestCase):
+    def reads(self, request):
+        """Runs the request, returning it and the replica each read was routed by."""
+        seen = []
+        route = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            seen.append(read_replica.get())
+            return route(router, model, **hints)
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', spy):
+            response = request()
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response, seen
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Expense), 'default')
+        token = read_replica.set('replica_0')
+        try:
+            self.assertEqual(router.db_for_read(Expense), 'replica_0')
+            self.assertEqual(router.db_for_write(Expense), 'default')
+        finally:
+            read_replica.reset(token)
+        self.assertFalse(router.allow_migrate('replica_0', 'expenses'))
+
+    def test_marked_views_read_from_replica(self):
+        _, seen = self.reads(lambda: self.client.get(reverse('group_detail', args=[self.group.id])))
+        self.assertIn('default', seen)
+        _, seen = self.reads(lambda: self.client.get(reverse('export_group_csv', args=[self.group.id])))
+        self.assertIn('default', seen)
+        self.assertIsNone(read_replica.get())
+
+        _, seen = self.reads(lambda: self.client.get(reverse('add_expense', args=[self.group.id])))
+        self.assertNotIn('default', seen)
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        response = self.add_expense('90.00')
+        self.assertIn('db_primary_until', response.cookies)
+
+        _, seen = self.reads(lambda: self.client.get(reverse('group_detail', args=[self.group.id])))
+        self.assertNotIn('default', seen)
+
+        self.client.cookies['db_primary_until'] = '0'
+        _, seen = self.reads(lambda: self.client.get(reverse('group_detail', args=[self.group.id])))
+        self.assertIn('default', seen)
+
+
+class JsonApiTests(GroupTestCase):
+    def test_balances_and_conditional_get(self):
+        self.add_expense('90.00')
+        url = reverse('api_group_balances', args=[self.group.id])
+
+        response = self.client.get(url)
+        self.assertEqual(response.json()['balances'][0], {
+            'user': {'id': self.alice.id, 'username': 'alice'}, 'amount': '60.00',
+        })
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        with mock.patch('expenses.cache.calculate_balances') as calculate:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        calculate.assert_not_called()
+
+        self.add_expense('30.00')
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], response['ETag'])
+
+    def test_expenses_are_paginated(self):
+        for _ in range(3):
+            self.add_expense('30.00')
+        with mock.patch('expenses.api.API_PAGE_SIZE', 2):
+            first = self.client.get(reverse('api_group_expenses', args=[self.group.id])).json()
+            second = self.client.get(
+                reverse('api_group_expenses', args=[self.group.id]), {'cursor': first['next_cursor']}
+            ).json()
+        self.assertEqual(len(first['results']), 2)
+        self.assertEqual(len(first['results'][0]['splits']), 3)
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next_cursor'])
+
+    def test_summary_plan_and_access(self):
+        self.add_expense('90.00')
+        summary = self.client.get(reverse('api_group_summary', args=[self.group.id])).json()
+        self.assertEqual(summary['my_balance'], '60.00')
+        plan = self.client.get(reverse('api_group_settlement_plan', args=[self.group.id])).json()
+        self.assertEqual(len(plan['transactions']), 2)
+        activities = self.client.get(reverse('api_group_activities', args=[self.group.id])).json()
+        self.assertEqual(len(activities['results']), 1)
+
+        outsider = User.objects.create(username='mallory')
+        self.client.force_login(outsider)
+        self.assertEqual(self.client.get(reverse('api_group_summary', args=[self.group.id])).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_group_summary', args=[self.group.id])).status_code, 401)
+
+
+class ChangeFeedTests(GroupTestCase):
+    def test_group_feed_returns_only_new_rows(self):
+        self.add_expense('90.00')
+        url = reverse('api_group_changes', args=[self.group.id])
+
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['expenses']), 1)
+        self.assertEqual(len(first['splits']), 3)
+        self.assertEqual({s['group_id'] for s in first['splits']}, {self.group.id})
+        self.assertEqual(len(first['activities']), 1)
+        self.assertFalse(first['has_more'])
+
+        empty = self.client.get(url, {'cursor': first['cursor']}).json()
+        self.assertEqual(empty['expenses'] + empty['splits'] + empty['activities'], [])
+        self.assertEqual(empty['cursor'], first['cursor'])
+
+        self.client.post(reverse('quick_settle', args=[self.group.id]), {
+            'paid_by': self.bob.id, 'paid_to': self.alice.id, 'amount': '30.00',
+        })
+        delta = self.client.get(url, {'cursor': first['cursor']}).json()
+        self.assertEqual(delta['expenses'], [])
+        self.assertEqual(len(delta['settlements']), 1)
+        self.assertEqual(delta['settlements'][0]['amount'], '30.00')
+        self.assertEqual(len(delta['activities']), 1)
+
+    def test_edits_and_deletes_reach_the_feed(self):
+        self.add_expense('90.00')
+        self.add_expense('30.00')
+        url = reverse('api_group_changes', args=[self.group.id])
+        cursor = self.client.get(url).json()['cursor']
+
+        first, second = Expense.objects.order_by('id')
+        first.amount = Decimal('60.00')
+        first.save()
+        split = Split.objects.filter(expense=first, user=self.bob).get()
+        deleted = [('split', split.id), ('expense', second.id)]
+        split.delete()
+        second.delete()
+
+        feed = self.client.get(url, {'cursor': cursor}).json()
+        self.assertEqual([(e['id'], e['amount']) for e in feed['expenses']], [(first.id, '60.00')])
+        self.assertEqual([(d['kind'], d['row_id']) for d in feed['deleted']], deleted)
+        self.assertFalse(feed['has_more'])
+
+        # the tombstones go with the group
+        self.group.delete()
+        self.assertFalse(DeletedRow.objects.exists())
+
+    def test_user_feed_pages_through_large_backlogs(self):
+        other = Group.objects.create(name='Flat', created_by=self.alice)
+        other.members.add(self.alice, self.bob)
+        self.add_expense('90.00')
+        record_expense(other, self.bob, 'Rent', Decimal('10.00'), [(self.alice.id, Decimal('10.00'))])
+
+        with mock.patch('expenses.sync.MAX_SEQS_PER_POLL', 2):
+            seen, cursor = [], None
+            for _ in range(10):
+                feed = self.client.get(reverse('api_user_changes'), {'cursor': cursor or ''}).json()
+                seen += [('split', s['id']) for s in feed['splits']]
+                seen += [('expense', e['id']) for e in feed['expenses']]
+                cursor = feed['cursor']
+                if not feed['has_more']:
+                    break
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len([kind for kind, _ in seen if kind == 'expense']), 2)
+        self.assertEqual(len([kind for kind, _ in seen if kind == 'split']), 4)
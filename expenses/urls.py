@@ -1,14 +1,33 @@
 from django.urls import path
-from . import views
+from . import api, exports, views
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
+    path('network/', views.network_balances, name='network_balances'),
     path('groups/create/', views.create_group, name='create_group'),
     path('groups/<int:group_id>/quick-settle/', views.quick_settle, name='quick_settle'),
+    path('groups/<int:group_id>/settle/', views.settle_plan, name='settle_plan'),
+    path('groups/<int:group_id>/members/add/', views.add_group_members, name='add_group_members'),
+    path('users/search/', views.search_users, name='search_users'),
     path('groups/<int:group_id>/activity/', views.activity_log, name='activity_log'),
     path('groups/<int:group_id>/', views.group_detail, name='group_detail'),
     path('groups/<int:group_id>/add-expense/', views.add_expense, name='add_expense'),
+    path('groups/<int:group_id>/import/', views.import_group_expenses, name='import_group_expenses'),
     path('accounts/register/', views.register, name='register'),
-    path('groups/<int:group_id>/export/csv/', views.export_group_csv, name='export_group_csv'),
-    path('groups/<int:group_id>/export/pdf/', views.export_group_pdf, name='export_group_pdf'),
+    path('groups/<int:group_id>/export/csv/', exports.export_group_csv, name='export_group_csv'),
+    path('groups/<int:group_id>/export/pdf/', exports.export_group_pdf, name='export_group_pdf'),
+    path('groups/<int:group_id>/export/pdf/status/', exports.group_pdf_status, name='group_pdf_status'),
+    path('groups/<int:group_id>/export/pdf/download/', exports.download_group_pdf, name='download_group_pdf'),
+    path('groups/<int:group_id>/archive/', views.group_archive, name='group_archive'),
+    path('groups/<int:group_id>/archive/<int:period_id>/', views.archived_period, name='archived_period'),
+    path('groups/<int:group_id>/archive/<int:period_id>/csv/', exports.export_archived_period_csv, name='export_archived_period_csv'),
+
+    # JSON API
+    path('api/groups/<int:group_id>/', api.group_summary, name='api_group_summary'),
+    path('api/groups/<int:group_id>/balances/', api.group_balances, name='api_group_balances'),
+    path('api/groups/<int:group_id>/settlement-plan/', api.group_settlement_plan, name='api_group_settlement_plan'),
+    path('api/groups/<int:group_id>/expenses/', api.group_expenses, name='api_group_expenses'),
+    path('api/groups/<int:group_id>/activities/', api.group_activities, name='api_group_activities'),
+    path('api/groups/<int:group_id>/changes/', api.group_changes, name='api_group_changes'),
+    path('api/changes/', api.user_changes, name='api_user_changes'),
 ]
\ No newline at end of file
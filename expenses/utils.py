@@ -1,66 +1,480 @@
 from collections import defaultdict
-from .models import Group 
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Group, Expense, Split, Settlement, Activity, MemberBalance
+from .money import to_minor, from_minor
+from .settlement import plan_settlements
 
-def calculate_balances(group: Group):
+
+def calculate_balances(group: Group, engine='ledger'):
     """
     Returns a dict: {user: net_amount}
     +ve => others owe this user
     -ve => this user owes others
+
+    engine picks where the numbers come from:
+      'ledger'    - the materialized MemberBalance rows, O(members)
+      'aggregate' - grouped SUM queries over the raw rows, in the database
+      'python'    - replays every expense/split/settlement in Python
+
+    Amounts are 2-place Decimals; internally everything is summed in
+    integer paise (see expenses.money) so totals reconcile exactly.
+    """
+
+    if engine == 'python':
+        totals = python_totals(group)
+    else:
+        totals = BALANCE_ENGINES[engine](group)
+    return hydrate_balances(totals)
+
+
+def ledger_totals(group: Group):
+    """{user_id: net_paise} straight from the MemberBalance ledger."""
+
+    return {
+        user_id: to_minor(amount)
+        for user_id, amount in group.member_balances.values_list('user_id', 'amount')
+    }
+
+
+def aggregate_totals(group: Group, after=None, before=None):
+    """
+    {user_id: net_paise} computed with grouped SUM queries, so only
+    one row per member crosses the wire instead of one per split.
+    `after` / `before` limit it to rows created in [after, before).
     """
 
-    balances = defaultdict(float)
+    expenses = Expense.objects.filter(group=group)
+    splits = Split.objects.filter(expense__group=group)
+    settlements = Settlement.objects.filter(group=group)
+    if after is not None:
+        expenses = expenses.filter(created_at__gte=after)
+        splits = splits.filter(expense__created_at__gte=after)
+        settlements = settlements.filter(created_at__gte=after)
+    if before is not None:
+        expenses = expenses.filter(created_at__lt=before)
+        splits = splits.filter(expense__created_at__lt=before)
+        settlements = settlements.filter(created_at__lt=before)
+
+    totals = defaultdict(int)
+
+    paid = expenses.order_by().values('paid_by_id').annotate(total=Sum('amount'))
+    for row in paid:
+        totals[row['paid_by_id']] += to_minor(row['total'])
+
+    owed = splits.order_by().values('user_id').annotate(total=Sum('amount'))
+    for row in owed:
+        totals[row['user_id']] -= to_minor(row['total'])
+
+    settled_by = settlements.order_by().values('paid_by_id').annotate(total=Sum('amount'))
+    for row in settled_by:
+        totals[row['paid_by_id']] += to_minor(row['total'])
+
+    settled_to = settlements.order_by().values('paid_to_id').annotate(total=Sum('amount'))
+    for row in settled_to:
+        totals[row['paid_to_id']] -= to_minor(row['total'])
+
+    return dict(totals)
+
+
+def python_totals(group: Group):
+    """
+    Recomputes {user_id: net_paise} by iterating every Expense, Split and
+    Settlement row in Python. Kept as a reference for benchmarks.
+    """
+
+    totals = defaultdict(int)
 
     # 1) apply expenses and splits
-    for expense in group.expenses.select_related('paid_by').prefetch_related('splits__user'):
+    for expense in group.expenses.prefetch_related('splits'):
         # paid_by gets +total amount
-        balances[expense.paid_by] += float(expense.amount)
+        totals[expense.paid_by_id] += to_minor(expense.amount)
 
         # each user owes their split amount 
         for split in expense.splits.all():
-            balances[split.user] -= float(split.amount)
+            totals[split.user_id] -= to_minor(split.amount)
 
     
     # 2) apply settlements (who paid to whom back)
-    for settlement in group.settlements.select_related('paid_by', 'paid_to'):
-        balances[settlement.paid_by] += float(settlement.amount)
-        balances[settlement.paid_to] -= float(settlement.amount)
+    for settlement in group.settlements.all():
+        totals[settlement.paid_by_id] += to_minor(settlement.amount)
+        totals[settlement.paid_to_id] -= to_minor(settlement.amount)
+
+
+    return dict(totals)
 
 
-    return balances
+BALANCE_ENGINES = {
+    'ledger': ledger_totals,
+    'aggregate': aggregate_totals,
+    'python': python_totals,
+}
 
 
-def simplify_debts(balances):
+def dashboard_groups(user):
     """
-    Input: balances dictionary {user: amount}
-    Output: list of (from_user, to_user, amount)
+    The user's groups annotated with member_count and my_balance (the
+    user's net in that group), in a single query however many groups
+    the user belongs to.
+    """
+
+    member_count = (
+        Group.members.through.objects
+        .filter(group_id=OuterRef('pk'))
+        .order_by().values('group_id')
+        .annotate(count=Count('user_id'))
+        .values('count')
+    )
+    my_balance = (
+        MemberBalance.objects
+        .filter(group_id=OuterRef('pk'), user=user)
+        .values('amount')[:1]
+    )
+    return (
+        user.split_groups
+        .annotate(
+            member_count=Coalesce(Subquery(member_count), 0),
+            my_balance=Coalesce(Subquery(my_balance), Value(Decimal('0.00')), output_field=DecimalField()),
+        )
+        .order_by('name', 'id')
+    )
+
+
+def hydrate_balances(totals):
+    """Turns {user_id: paise} into {user: Decimal}, loading only those users."""
+
+    users = User.objects.only('id', 'username').in_bulk(list(totals))
+    return {users[user_id]: from_minor(amount) for user_id, amount in totals.items()}
+
+
+def apply_balance_deltas(group: Group, deltas):
+    """
+    Adds {user_id: paise} deltas to the group's MemberBalance rows.
+    Must run inside the same transaction as the write it reflects.
+    """
+
+    deltas = {user_id: amount for user_id, amount in deltas.items() if amount}
+    if not deltas:
+        return
+
+    MemberBalance.objects.bulk_create(
+        [MemberBalance(group=group, user_id=user_id) for user_id in deltas],
+        ignore_conflicts=True,
+    )
+    rows = list(
+        MemberBalance.objects.select_for_update()
+        .filter(group=group, user_id__in=deltas)
+    )
+    for row in rows:
+        row.amount = from_minor(to_minor(row.amount) + deltas[row.user_id])
+    MemberBalance.objects.bulk_update(rows, ['amount'])
+
+
+def expense_deltas(expense, splits):
+    """Balance deltas (paise) for an expense and its (user_id, amount) splits."""
+
+    deltas = defaultdict(int)
+    deltas[expense.paid_by_id] += to_minor(expense.amount)
+    for user_id, amount in splits:
+        deltas[user_id] -= to_minor(amount)
+    return deltas
+
+
+def settlement_deltas(settlement):
+    """Balance deltas (paise) for a settlement (debtor pays creditor back)."""
+
+    deltas = defaultdict(int)
+    deltas[settlement.paid_by_id] += to_minor(settlement.amount)
+    deltas[settlement.paid_to_id] -= to_minor(settlement.amount)
+    return deltas
+
+
+def row_deltas(row):
+    """
+    (group_id, {user_id: paise}): what one Expense, Split or Settlement
+    row contributes to the ledger on its own.
+    """
+
+    if isinstance(row, Split):
+        return row.group_id, {row.user_id: -to_minor(row.amount)}
+    if isinstance(row, Settlement):
+        return row.group_id, settlement_deltas(row)
+    return row.group_id, {row.paid_by_id: to_minor(row.amount)}
+
+
+def unapply_balance_deltas(group_id, deltas):
+    """
+    Takes a deleted row's deltas back out of the ledger. Only updates
+    existing MemberBalance rows, so it is safe inside a cascade that is
+    deleting the group (and its balances) at the same time.
+    """
+
+    for user_id, amount in deltas.items():
+        if amount:
+            MemberBalance.objects.filter(group_id=group_id, user_id=user_id).update(
+                amount=F('amount') - from_minor(amount)
+            )
+
+
+def reserve_seqs(group: Group, count):
+    """
+    Hands out `count` consecutive change-feed sequence numbers for the
+    group. The UPDATE row-locks the group until commit, so writers to one
+    group commit in sequence order and a reader can never see seq N + 1
+    before N. Must run inside the write's transaction, before any other
+    locks are taken.
+    """
+
+    Group.objects.filter(pk=group.pk).update(change_seq=F('change_seq') + count)
+    end = Group.objects.filter(pk=group.pk).values_list('change_seq', flat=True).get()
+    return iter(range(end - count + 1, end + 1))
+
+
+@transaction.atomic
+def record_expense(group: Group, paid_by, description, amount, shares):
+    """
+    Writes an already-validated expense as one atomic unit: the
+    change-feed sequence reservation, one Expense INSERT, one bulk INSERT
+    for its splits, the ledger update and the Activity row.
+    `shares` is a list of (user_id, amount).
+    """
+
+    seqs = reserve_seqs(group, len(shares) + 2)
+
+    expense = Expense.objects.create(
+        group=group,
+        description=description,
+        amount=amount,
+        paid_by=paid_by,
+        seq=next(seqs),
+    )
+    Split.objects.bulk_create([
+        Split(expense=expense, group=group, user_id=user_id, amount=share, seq=next(seqs))
+        for user_id, share in shares
+    ])
+
+    # keep the balance ledger in step with the new splits
+    apply_balance_deltas(group, expense_deltas(expense, shares))
+
+    Activity.objects.create(
+        group=group,
+        user=paid_by,
+        message=f'{paid_by.username} added expense "{expense.description}" ₹{expense.amount}',
+        seq=next(seqs),
+    )
+    return expense
+
+
+class SettlementError(ValueError):
+    """A settlement the current balances don't allow."""
+
+
+def record_settlement(group: Group, paid_by_id, paid_to_id, amount, recorded_by, client_token=None):
+    """
+    Records `paid_by` paying `paid_to` back, validated against the ledger
+    rather than a replay of the group's history. Returns (settlement, created).
+
+    The amount may not exceed what the debtor owes nor what the creditor
+    is owed. Both MemberBalance rows are read under the group's seq lock
+    and select_for_update, so concurrent settlements can't both pass.
+    A `client_token` repeated in the same group returns the settlement it
+    already created.
+    """
+
+    if client_token:
+        existing = Settlement.objects.filter(group=group, client_token=client_token).first()
+        if existing is not None:
+            return existing, False
+
+    minor = to_minor(amount)
+    if minor <= 0 or paid_by_id == paid_to_id:
+        raise SettlementError("Enter a positive amount between two different members.")
+
+    try:
+        with transaction.atomic():
+            seqs = reserve_seqs(group, 2)
+            rows = {
+                row.user_id: row
+                for row in MemberBalance.objects.select_for_update(of=('self',))
+                .select_related('user')
+                .filter(group=group, user_id__in=[paid_by_id, paid_to_id])
+                .order_by('user_id')
+            }
+            debtor, creditor = rows.get(paid_by_id), rows.get(paid_to_id)
+            owes = -to_minor(debtor.amount) if debtor else 0
+            owed = to_minor(creditor.amount) if creditor else 0
+            if minor > min(owes, owed):
+                raise SettlementError(f"At most ₹{from_minor(max(min(owes, owed), 0))} can be settled.")
+
+            settlement = Settlement.objects.create(
+                group=group,
+                paid_by_id=paid_by_id,
+                paid_to_id=paid_to_id,
+                amount=from_minor(minor),
+                client_token=client_token or None,
+                seq=next(seqs),
+            )
+            debtor.amount = from_minor(to_minor(debtor.amount) + minor)
+            creditor.amount = from_minor(to_minor(creditor.amount) - minor)
+            MemberBalance.objects.bulk_update([debtor, creditor], ['amount'])
+
+            Activity.objects.create(
+                group=group,
+                user=recorded_by,
+                message=f'{debtor.user.username} settled ₹{settlement.amount} with {creditor.user.username}',
+                seq=next(seqs),
+            )
+    except IntegrityError:
+        # the same token committed while we waited for the lock
+        if client_token:
+            existing = Settlement.objects.filter(group=group, client_token=client_token).first()
+            if existing is not None:
+                return existing, False
+        raise
+    return settlement, True
+
+
+class StalePlanError(SettlementError):
+    """The group changed after the settlement plan was shown."""
+
+
+@transaction.atomic
+def record_settlement_plan(group: Group, transfers, recorded_by, plan_seq):
+    """
+    Records several settlements at once, e.g. the whole "Who Should Pay
+    Whom" plan. `transfers` is a list of (paid_by_id, paid_to_id, amount)
+    and `plan_seq` the group's change_seq when the plan was computed; if
+    anything was written since, StalePlanError is raised.
+
+    Each transfer is checked against the locked ledger like
+    record_settlement, then everything is written with one bulk INSERT
+    per table and one ledger UPDATE, whatever the number of transfers.
     """
 
-    creditors = []      # people who should receive money (as they already paid)
-    debtors = []        # people who owes money (they have to pay to others)
+    from .cache import invalidate_group
+
+    if not transfers:
+        raise SettlementError("Select at least one transfer.")
+
+    seqs = list(reserve_seqs(group, 2 * len(transfers)))
+    if seqs[0] != plan_seq + 1:
+        raise StalePlanError("The balances changed, please review the new plan.")
+    seqs = iter(seqs)
+
+    user_ids = {user_id for paid_by_id, paid_to_id, _ in transfers for user_id in (paid_by_id, paid_to_id)}
+    rows = {
+        row.user_id: row
+        for row in MemberBalance.objects.select_for_update(of=('self',))
+        .select_related('user')
+        .filter(group=group, user_id__in=user_ids)
+        .order_by('user_id')
+    }
+    running = {user_id: to_minor(row.amount) for user_id, row in rows.items()}
+
+    settlements = []
+    for paid_by_id, paid_to_id, amount in transfers:
+        minor = to_minor(amount)
+        owes, owed = -running.get(paid_by_id, 0), running.get(paid_to_id, 0)
+        if minor <= 0 or paid_by_id == paid_to_id or minor > min(owes, owed):
+            raise SettlementError(f"Can't settle ₹{from_minor(minor)} between those members.")
+        running[paid_by_id] += minor
+        running[paid_to_id] -= minor
+        settlements.append(Settlement(
+            group=group, paid_by_id=paid_by_id, paid_to_id=paid_to_id,
+            amount=from_minor(minor), seq=next(seqs),
+        ))
 
-    for user, amount in balances.items():
-        if amount > 0:
-            creditors.append([user, amount])
-        elif amount < 0:
-            debtors.append([user, -amount])
+    Settlement.objects.bulk_create(settlements)
+    Activity.objects.bulk_create([
+        Activity(
+            group=group,
+            user=recorded_by,
+            message=f'{rows[s.paid_by_id].user.username} settled ₹{s.amount} with {rows[s.paid_to_id].user.username}',
+            seq=next(seqs),
+        )
+        for s in settlements
+    ])
 
-    i = j = 0
-    transactions = []
+    for user_id, row in rows.items():
+        row.amount = from_minor(running[user_id])
+    MemberBalance.objects.bulk_update(rows.values(), ['amount'])
 
-    while i < len(debtors) and j < len(creditors):
-        debtor, debt_amount = debtors[i]
-        creditor, credit_amount = creditors[j]
+    # bulk_create skips the post_save signals that normally do this
+    invalidate_group(group.id)
+    return settlements
 
-        settle_amount = min(debt_amount, credit_amount)
 
-        transactions.append((debtor, creditor, round(settle_amount, 2)))
+USER_SEARCH_LIMIT = 10
 
-        debtors[i][1] -= settle_amount
-        creditors[j][1] -= settle_amount
 
-        if debtors[i][1] == 0:
-            i += 1
-        if creditors[j][1] == 0:
-            j += 1
+def users_by_prefix(prefix, exclude_group=None, limit=USER_SEARCH_LIMIT):
+    """
+    Users whose username starts with `prefix` (case-insensitive), for the
+    member autocomplete. On PostgreSQL the lookup is served by the
+    username prefix index (migration 0010); results are capped at `limit`.
+    """
+
+    prefix = prefix.strip()
+    if not prefix:
+        return []
+    users = User.objects.filter(username__istartswith=prefix, is_active=True)
+    if exclude_group is not None:
+        users = users.exclude(split_groups=exclude_group)
+    return list(users.order_by('username').values('id', 'username')[:limit])
+
+
+@transaction.atomic
+def add_members(group: Group, users, added_by):
+    """
+    Adds `users` to the group, skipping existing members, with one
+    Activity row for the change feed. Returns the users added.
+    """
+
+    from .cache import invalidate_group
+
+    existing = set(group.members.filter(pk__in=[u.pk for u in users]).values_list('pk', flat=True))
+    new = [user for user in users if user.pk not in existing]
+    if not new:
+        return []
+
+    seqs = reserve_seqs(group, 1)
+    group.members.add(*new)
+    Activity.objects.create(
+        group=group,
+        user=added_by,
+        message=f'{added_by.username} added {", ".join(u.username for u in new)} to the group',
+        seq=next(seqs),
+    )
+    # m2m changes don't fire the save signals that normally do this
+    invalidate_group(group.id)
+    return new
+
+
+def rebuild_balances(group: Group):
+    """Replaces the group's MemberBalance rows with a fresh aggregate."""
+
+    with transaction.atomic():
+        # locks out writers while the totals are read and replaced
+        reserve_seqs(group, 1)
+        totals = aggregate_totals(group)
+        group.member_balances.all().delete()
+        MemberBalance.objects.bulk_create([
+            MemberBalance(group=group, user_id=user_id, amount=from_minor(amount))
+            for user_id, amount in totals.items()
+        ])
+    return totals
+
+
+def simplify_debts(balances, strategy=None):
+    """
+    Input: balances dictionary {user: amount}
+    Output: list of (from_user, to_user, amount)
+
+    Delegates to the configured settlement planner (expenses.settlement);
+    amounts are matched in integer paise so no dust transactions appear.
+    """
 
-    return transactions
\ No newline at end of file
+    return plan_settlements(balances, strategy=strategy)
@@ -1,49 +1,84 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib import messages
 from django import forms
-from .models import Group, Expense, Split, Settlement, Activity
-from .utils import calculate_balances, simplify_debts
-from .forms import GroupForm, ExpenseForm
+from .models import Group, ArchivedPeriod
+from .archive import read_archive
+from .utils import SettlementError, add_members, dashboard_groups, record_expense, record_settlement, record_settlement_plan, users_by_prefix
+from .cache import get_group_summary
+from .checkpoints import end_of_day, parse_as_of
+from .exports import redirect_if_archived
+from .money import AllocationError, split_amount, to_minor, from_minor
+from .forms import AddMembersForm, GroupForm, ExpenseForm, ExpenseImportForm, selected_members
+from .importer import ImportValidationError, detect_format, import_expenses, open_text
 from django.contrib.auth.models import User
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.forms import UserCreationForm
-import csv
-from django.http import HttpResponse
+from django.conf import settings
+import uuid
 from django.contrib.auth.decorators import login_required
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import cm
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from datetime import datetime
+from django.http import JsonResponse
+from django.utils.functional import SimpleLazyObject
+from .network import pair_transfers, pairwise_positions
+from .pagination import keyset_page
+from .routers import replica_reads
+from django.urls import reverse
+
+EXPENSES_PER_PAGE = 20
+ACTIVITIES_PER_PAGE = 50
+MIN_SEARCH_LENGTH = 2
 
 @login_required
 def dashboard(request):
-    groups = request.user.split_groups.all()
+    groups = list(dashboard_groups(request.user))
+
     return render(request, 'expenses/dashboard.html', {
         'groups': groups,
+        'net_total': from_minor(sum(to_minor(g.my_balance) for g in groups)),
     })
 
 @login_required
+@replica_reads
 def group_detail(request, group_id):
     group = get_object_or_404(Group, id=group_id, members=request.user)
 
-    balances_dict = calculate_balances(group)
-    balance_entries = list(balances_dict.items())
+    as_of = parse_as_of(request.GET.get('as_of'))
+    archived = redirect_if_archived(request, group, as_of)
+    if archived:
+        return archived
+
+    summary = get_group_summary(group, as_of=as_of)
+    expenses_cursor = request.GET.get('expenses')
 
-    transactions = simplify_debts(balances_dict)
+    expenses = group.expenses.select_related('paid_by').prefetch_related('splits__user')
+    if as_of is not None:
+        expenses = expenses.filter(created_at__lt=end_of_day(as_of))
 
-    recent_activities = group.activities.order_by('-created_at')[:5]
+    # Members, plan, balances and expenses are cached template fragments
+    # keyed by the data version, so everything they show is built here
+    # (no lazy querysets in the template) and only on a fragment miss.
+    members = SimpleLazyObject(lambda: list(group.members.order_by('id')))
+    expenses_page = SimpleLazyObject(lambda: keyset_page(
+        expenses,
+        cursor=expenses_cursor,
+        page_size=EXPENSES_PER_PAGE,
+    ))
 
-    expenses = group.expenses.select_related('paid_by').prefetch_related('splits__user').all().order_by('-created_at')
+    recent_activities = list(group.activities.order_by('-created_at', '-id')[:5])
 
     return render(request, 'expenses/group_detail.html', {
         'group': group,
-        'balances': balance_entries,
-        'transactions': transactions,
-        'expenses': expenses,
+        'as_of': as_of,
+        'data_version': summary['version'],
+        'fragment_timeout': settings.EXPENSES_CACHE_TIMEOUT,
+        'members': members,
+        'balance_entries': list(summary['balances'].items()),
+        'transactions': summary['transactions'],
+        'expenses_page': expenses_page,
+        'expenses_cursor': expenses_cursor,
         'recent_activities': recent_activities,
+        'member_search_url': f"{reverse('search_users')}?group={group.id}",
+        'settle_token': uuid.uuid4().hex,
     })
 
 
@@ -56,75 +91,28 @@ def add_expense(request, group_id):
         form = ExpenseForm(request.POST)
         if form.is_valid():
             description = form.cleaned_data['description']
-            amount = float(form.cleaned_data['amount'])
+            amount = form.cleaned_data['amount']
             split_type = form.cleaned_data.get('split_type', 'equal')
 
-            # create expense first
-            expense = Expense.objects.create(
-                group=group,
-                description=description,
-                amount=amount,
-                paid_by=request.user
+            # read each member's input from POST: share_<user_id>
+            # (a share amount, a percentage or a weight depending on split_type)
+            values = [request.POST.get(f"share_{m.id}", '').strip() or '0' for m in members]
+
+            # work out every member's share in one pass before writing anything
+            try:
+                shares = split_amount(amount, split_type, values)
+            except AllocationError as e:
+                return render(request, 'expenses/add_expense.html', {
+                    'group': group, 'form': form, 'members': members,
+                    'error': str(e),
+                })
+
+            record_expense(
+                group, request.user, description, amount,
+                list(zip((m.id for m in members), shares)),
             )
 
-            # Equal split
-            if split_type == 'equal':
-                per_share = round(amount / len(members), 2)
-                # adjust last person's share to match total (to avoid tiny rounding diff)
-                for i, m in enumerate(members):
-                    share = per_share
-                    if i == len(members) - 1:
-                        share = round(amount - per_share * (len(members) - 1), 2)
-                    Split.objects.create(expense=expense, user=m, amount=share)
-                    
-                # Activity log for the equal split expense
-                Activity.objects.create(
-                    group=group,
-                    user=request.user,
-                    message=f'{request.user.username} added expense "{expense.description}" ₹{expense.amount}'
-                )
-
-                return redirect('group_detail', group_id=group.id)
-
-            # Unequal split
-            else:
-                splits_to_create = []
-                total_share = 0.0
-                # read each member's share from POST: share_<user_id>
-                for m in members:
-                    key = f"share_{m.id}"
-                    raw = request.POST.get(key, '').strip()
-                    try:
-                        share_value = float(raw) if raw != '' else 0.0
-                    except ValueError:
-                        expense.delete()
-                        return render(request, 'expenses/add_expense.html', {
-                            'group': group, 'form': form, 'members': members,
-                            'error': f"Invalid number for {m.username}: {raw}"
-                        })
-                    total_share += share_value
-                    splits_to_create.append((m, round(share_value, 2)))
-
-                # validate total equals expense amount within tolerance
-                if abs(total_share - amount) > 0.01:
-                    expense.delete()
-                    return render(request, 'expenses/add_expense.html', {
-                        'group': group, 'form': form, 'members': members,
-                        'error': f"Total shares ({total_share}) must equal expense amount ({amount})."
-                    })
-
-                # create Split objects
-                for m, share in splits_to_create:
-                    Split.objects.create(expense=expense, user=m, amount=share)
-
-                # Activity log for the unequal split expense
-                Activity.objects.create(
-                    group=group,
-                    user=request.user,
-                    message=f'{request.user.username} added expense "{expense.description}" ₹{expense.amount}'
-                )
-
-                return redirect('group_detail', group_id=group.id)
+            return redirect('group_detail', group_id=group.id)
 
         return render(request, 'expenses/add_expense.html', {
             'group': group, 'form': form, 'members': members,
@@ -139,6 +127,39 @@ def add_expense(request, group_id):
         'members': members,
     })
 
+@login_required
+def import_group_expenses(request, group_id):
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+    errors = None
+
+    if request.method == 'POST':
+        form = ExpenseImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_expenses(
+                    group, request.user, open_text(upload), detect_format(upload.name)
+                )
+            except ImportValidationError as e:
+                errors = e.errors
+            except UnicodeDecodeError:
+                errors = [(0, "The file is not UTF-8 encoded text.")]
+            else:
+                # redirect so a refresh can't import the file again
+                messages.success(request, (
+                    f"Imported {result.rows} expenses in {result.seconds:.2f}s "
+                    f"({result.rows_per_second:.0f} rows/s)."
+                ))
+                return redirect('group_detail', group_id=group.id)
+    else:
+        form = ExpenseImportForm()
+
+    return render(request, 'expenses/import_expenses.html', {
+        'group': group,
+        'form': form,
+        'errors': errors,
+    })
+
 @login_required
 def create_group(request):
     if request.method == 'POST':
@@ -159,8 +180,42 @@ def create_group(request):
         
     return render(request, 'expenses/create_group.html', {
         'form': form,
+        'search_url': reverse('search_users'),
+        'selected_members': selected_members(form),
     })
 
+
+@login_required
+@replica_reads
+def search_users(request):
+    """
+    Username prefix search for the member picker: ?q=<prefix>, optionally
+    &group=<id> to leave out that group's members. At most
+    USER_SEARCH_LIMIT results.
+    """
+    q = request.GET.get('q', '')
+    group = None
+    if request.GET.get('group', '').isdigit():
+        group = get_object_or_404(Group, id=request.GET['group'], members=request.user)
+    if len(q.strip()) < MIN_SEARCH_LENGTH:
+        return JsonResponse({'results': []})
+    return JsonResponse({'results': users_by_prefix(q, exclude_group=group)})
+
+
+@login_required
+def add_group_members(request, group_id):
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+
+    if request.method == 'POST':
+        form = AddMembersForm(request.POST)
+        if form.is_valid():
+            add_members(group, list(form.cleaned_data['members']), added_by=request.user)
+        else:
+            for error in form.errors['members']:
+                messages.error(request, error)
+
+    return redirect('group_detail', group_id=group_id)
+
 def register(request):
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
@@ -186,310 +241,135 @@ def quick_settle(request, group_id):
     if request.method == 'POST':
         group = get_object_or_404(Group, id=group_id, members=request.user)
 
-        paid_by_id = int(request.POST['paid_by'])
-        paid_to_id = int(request.POST['paid_to'])
-        amount = float(request.POST['amount'])
-
-        balances = calculate_balances(group)
-
-        debtor = User.objects.get(id=paid_by_id)
-        creditor = User.objects.get(id=paid_to_id)
+        try:
+            record_settlement(
+                group,
+                paid_by_id=int(request.POST['paid_by']),
+                paid_to_id=int(request.POST['paid_to']),
+                amount=request.POST['amount'],
+                recorded_by=request.user,
+                client_token=request.POST.get('client_token', '')[:64],
+            )
+        except SettlementError as e:
+            messages.error(request, str(e))
+        except (KeyError, ValueError):
+            messages.error(request, "Choose two members and enter an amount to settle.")
 
-        debtor_balance = balances.get(debtor, 0)
-        owed_amount = abs(debtor_balance)
+    return redirect('group_detail', group_id=group_id)
 
-        if amount <= 0 or amount > owed_amount:
-            return redirect('group_detail', group_id=group_id)
+@login_required
+def settle_plan(request, group_id):
+    """Settles the checked transfers of the plan, or all of them."""
 
-        Settlement.objects.create(
-            group=group,
-            paid_by=debtor,
-            paid_to=creditor,
-            amount=amount
-        )
+    if request.method == 'POST':
+        group = get_object_or_404(Group, id=group_id, members=request.user)
 
-        # New Activity log
-        Activity.objects.create(
-            group=group,
-            user=request.user,
-            message=f'{debtor.username} settled ₹{amount} with {creditor.username}'
-        )
+        try:
+            if request.POST.get('all'):
+                transfers = [
+                    (debtor.id, creditor.id, amount)
+                    for debtor, creditor, amount in get_group_summary(group)['transactions']
+                ]
+            else:
+                transfers = []
+                for value in request.POST.getlist('transfer'):
+                    paid_by, paid_to, amount = value.split(':')
+                    transfers.append((int(paid_by), int(paid_to), amount))
+            record_settlement_plan(group, transfers, request.user, int(request.POST['plan_seq']))
+        except SettlementError as e:
+            # including StalePlanError
+            messages.error(request, str(e))
+        except (KeyError, ValueError):
+            messages.error(request, "That settlement plan could not be read.")
 
     return redirect('group_detail', group_id=group_id)
 
+
 @login_required
+@replica_reads
 def activity_log(request, group_id):
     group = get_object_or_404(Group, id=group_id, members=request.user)
 
-    activities = group.activities.order_by('-created_at')
+    page = keyset_page(
+        group.activities.all(),
+        cursor=request.GET.get('cursor'),
+        page_size=ACTIVITIES_PER_PAGE,
+    )
 
     return render(request, 'expenses/activity_log.html', {
         'group': group, 
-        'activities': activities,
+        'activities': page.items,
+        'page': page,
+        'cursor': request.GET.get('cursor'),
     })
 
 @login_required
-def export_group_csv(request, group_id):
+@replica_reads
+def group_archive(request, group_id):
     group = get_object_or_404(Group, id=group_id, members=request.user)
 
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{group.name}_summary.csv"'
-
-    writer = csv.writer(response)
-
-    # Group info
-    writer.writerow(['Group Name', group.name])
-    writer.writerow([])
-    
-    # Members
-    writer.writerow(['Members'])
-    for m in group.members.all():
-        writer.writerow([m.username])
-    writer.writerow([])
-
-    # Expenses
-    writer.writerow(['Expenses'])
-    writer.writerow(['Description', 'Paid By', 'Amount'])
-    for e in group.expenses.select_related('paid_by'):
-        writer.writerow([e.description, e.paid_by.username, e.amount])
-    writer.writerow([])
-
-    # Settlements
-    writer.writerow(['Settlements'])
-    writer.writerow(['Paid By', 'Paid To', 'Amount'])
-    for s in group.settlements.select_related('paid_by', 'paid_to'):
-        writer.writerow([s.paid_by.username, s.paid_to.username, s.amount])
-    writer.writerow([])
-
-    # Final balances
-    balances = calculate_balances(group)
-    writer.writerow(['Final Balances'])
-    writer.writerow(['User', 'Net Amount'])
-    for user, amount in balances.items():
-        writer.writerow([user.username, amount])
-
-    return response
+    return render(request, 'expenses/group_archive.html', {
+        'group': group,
+        'periods': group.archived_periods.order_by('-end'),
+    })
 
 @login_required
-def export_group_pdf(request, group_id):
+@replica_reads
+def archived_period(request, group_id, period_id):
     group = get_object_or_404(Group, id=group_id, members=request.user)
+    period = get_object_or_404(ArchivedPeriod, id=period_id, group=group)
+
+    expenses, settlements = {}, []
+    for row in read_archive(period):
+        if row['type'] == 'expense':
+            expenses[row['id']] = {**row, 'splits': []}
+        elif row['type'] == 'split':
+            expenses[row['expense_id']]['splits'].append(row)
+        elif row['type'] == 'settlement':
+            settlements.append(row)
+
+    return render(request, 'expenses/archived_period.html', {
+        'group': group,
+        'period': period,
+        'expenses': sorted(expenses.values(), key=lambda e: e['created_at'], reverse=True),
+        'settlements': settlements,
+    })
 
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{group.name}_summary.pdf"'
-
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-    
-    # Starting position
-    y = height - 2 * cm
-    left_margin = 2 * cm
-    right_margin = width - 2 * cm
-
-    def draw_header():
-        """Draw the header section with title and date"""
-        nonlocal y
-        
-        # Title with background
-        p.setFillColorRGB(0.2, 0.4, 0.8)  # Blue background
-        p.rect(left_margin - 0.3*cm, y - 0.9*cm, right_margin - left_margin + 0.6*cm, 1.3*cm, fill=1, stroke=0)
-        
-        # White text on blue background
-        p.setFillColorRGB(1, 1, 1)
-        p.setFont("Helvetica-Bold", 18)
-        p.drawString(left_margin + 0.2*cm, y - 0.45*cm, f"Group Summary: {group.name}")
-        
-        # Date on the right
-        p.setFont("Helvetica", 10)
-        date_str = datetime.now().strftime("%B %d, %Y")
-        p.drawRightString(right_margin - 0.2*cm, y - 0.45*cm, f"Generated: {date_str}")
-        
-        y -= 2.8 * cm
-        p.setFillColorRGB(0, 0, 0)  # Reset to black
-
-    def draw_section_header(title):
-        """Draw a section header with underline"""
-        nonlocal y
-        if y < 6 * cm:  # Check if we need a new page (more conservative)
-            p.showPage()
-            y = height - 2 * cm
-        
-        # Add spacing before section
-        y -= 0.5 * cm
-        
-        p.setFont("Helvetica-Bold", 14)
-        p.setFillColorRGB(0.2, 0.4, 0.8)
-        p.drawString(left_margin, y, title)
-        
-        # Draw underline
-        p.setStrokeColorRGB(0.2, 0.4, 0.8)
-        p.setLineWidth(2)
-        p.line(left_margin, y - 0.15*cm, right_margin, y - 0.15*cm)
-        
-        y -= 0.9 * cm  # Spacing after header
-        p.setFillColorRGB(0, 0, 0)
-        p.setStrokeColorRGB(0, 0, 0)
-        p.setLineWidth(1)
-
-    def draw_text(text, indent=0, bold=False):
-        """Draw regular text with optional indent"""
-        nonlocal y
-        if y < 2 * cm:
-            p.showPage()
-            y = height - 2 * cm
-        
-        if bold:
-            p.setFont("Helvetica-Bold", 11)
-        else:
-            p.setFont("Helvetica", 11)
-        
-        p.drawString(left_margin + indent * cm, y, text)
-        y -= 0.6 * cm
-
-    def draw_table(data, col_widths=None):
-        """Draw a formatted table"""
-        nonlocal y
-        
-        if not data:
-            return
-        
-        # Default column widths if not specified
-        if col_widths is None:
-            col_widths = [width / len(data[0]) - 0.5*cm for _ in data[0]]
-        
-        # Calculate approximate table height (more accurate)
-        row_height = 0.75 * cm
-        table_height = len(data) * row_height + 0.5 * cm
-        
-        # Check if we need a new page
-        if y - table_height < 3.5 * cm:
-            p.showPage()
-            y = height - 2 * cm
-        
-        # Create table
-        table = Table(data, colWidths=col_widths, rowHeights=row_height)
-        
-        # Style the table
-        style = TableStyle([
-            # Header row
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3366CC')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('TOPPADDING', (0, 0), (-1, 0), 10),
-            ('LEFTPADDING', (0, 0), (-1, -1), 10),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-            
-            # Data rows
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-            ('TOPPADDING', (0, 1), (-1, -1), 8),
-            
-            # Grid
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#3366CC')),
-            
-            # Alternating row colors
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F0F0F0')]),
-        ])
-        
-        table.setStyle(style)
-        
-        # Calculate actual table size
-        table_width, actual_height = table.wrap(width - 4*cm, height)
-        
-        # Draw the table
-        table.drawOn(p, left_margin, y - actual_height)
-        
-        # Update y position with actual height plus spacing
-        y -= actual_height + 1.5 * cm
-
-    # Start drawing the PDF
-    draw_header()
-    
-    # Members Section
-    draw_section_header("Group Members")
-    members_data = [['Username']]
-    for m in group.members.all():
-        members_data.append([m.username])
-    draw_table(members_data, col_widths=[10*cm])
-    
-    # Expenses Section
-    draw_section_header("Expenses")
-    expenses = group.expenses.select_related('paid_by').order_by('-created_at')
-    if expenses.exists():
-        expenses_data = [['Description', 'Paid By', 'Amount (Rs.)']]
-        for e in expenses:
-            expenses_data.append([
-                e.description[:40],  # Truncate long descriptions
-                e.paid_by.username,
-                f"Rs. {e.amount:.2f}"
-            ])
-        draw_table(expenses_data, col_widths=[9*cm, 4*cm, 4*cm])
-    else:
-        draw_text("No expenses recorded yet.", indent=0.5)
-        y -= 0.5 * cm
-    
-    # Settlements Section
-    draw_section_header("Settlements")
-    settlements = group.settlements.select_related('paid_by', 'paid_to').order_by('-created_at')
-    if settlements.exists():
-        settlements_data = [['Paid By', 'Paid To', 'Amount (Rs.)']]
-        for s in settlements:
-            settlements_data.append([
-                s.paid_by.username,
-                s.paid_to.username,
-                f"Rs. {s.amount:.2f}"
-            ])
-        draw_table(settlements_data, col_widths=[5*cm, 5*cm, 4*cm])
-    else:
-        draw_text("No settlements recorded yet.", indent=0.5)
-        y -= 0.5 * cm
-    
-    # Final Balances Section
-    draw_section_header("Final Balances")
-    balances = calculate_balances(group)
-    if balances:
-        balances_data = [['Member', 'Balance (Rs.)', 'Status']]
-        for user, amount in sorted(balances.items(), key=lambda x: x[1], reverse=True):
-            status = "Should Receive" if amount > 0 else "Owes" if amount < 0 else "Settled"
-            balances_data.append([
-                user.username,
-                f"Rs. {abs(amount):.2f}",
-                status
-            ])
-        draw_table(balances_data, col_widths=[6*cm, 4*cm, 5*cm])
-    else:
-        draw_text("No balance information available.", indent=0.5)
-        y -= 0.5 * cm
-    
-    # Who Should Pay Whom Section
-    draw_section_header("Settlement Recommendations")
-    transactions = simplify_debts(balances)
-    if transactions:
-        transactions_data = [['From', 'To', 'Amount (Rs.)']]
-        for debtor, creditor, amount in transactions:
-            transactions_data.append([
-                debtor.username,
-                creditor.username,
-                f"Rs. {amount:.2f}"
-            ])
-        draw_table(transactions_data, col_widths=[5*cm, 5*cm, 4*cm])
-    else:
-        draw_text("✓ All settled! No pending payments.", indent=0.5, bold=True)
-    
-    # Footer
-    y = 1.5 * cm
-    p.setFont("Helvetica-Oblique", 9)
-    p.setFillColorRGB(0.5, 0.5, 0.5)
-    p.drawCentredString(width / 2, y, f"Generated by Splitwise - {group.name}")
-    
-    p.showPage()
-    p.save()
-
-    return response
\ No newline at end of file
+@login_required
+@replica_reads
+def network_balances(request):
+    """
+    The user's side of the cross-group settlement plan: who they should
+    pay (or be paid by) once debts are netted across the groups they
+    share with each person, plus their per-person net positions.
+    """
+    # transfers only run between people sharing a group, so the user's
+    # own groups are all that can involve them
+    group_ids = set(request.user.split_groups.values_list('id', flat=True))
+    me = request.user.id
+
+    mine = {
+        (a, b): amount
+        for (a, b), amount in pairwise_positions(group_ids).items()
+        if me in (a, b)
+    }
+    transfers = pair_transfers(mine)
+    pairs = {
+        (b if a == me else a): (amount if a == me else -amount)
+        for (a, b), amount in mine.items()
+    }
+    usernames = dict(
+        User.objects.filter(id__in={me, *pairs}).values_list('id', 'username')
+    )
+
+    return JsonResponse({
+        'transfers': [
+            {'from': usernames[debtor], 'to': usernames[creditor], 'amount': str(amount)}
+            for debtor, creditor, amount in transfers
+        ],
+        # +ve: you owe them, -ve: they owe you
+        'positions': [
+            {'user': usernames[other], 'amount': str(from_minor(amount))}
+            for other, amount in sorted(pairs.items())
+        ],
+    })